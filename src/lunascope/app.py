@@ -63,6 +63,10 @@ def _parse_args(argv):
                     help="parameter file")
     ap.add_argument("--cmap", "-c", dest="cmap_file", metavar="FILE",
                     help="color map file")
+    ap.add_argument("--cache-mb", dest="cache_mb", type=int, metavar="MB",
+                    help="memory budget for cached signal windows (default 256)")
+    ap.add_argument("--spec-cache", dest="spec_cache", metavar="DIR",
+                    help="folder for cached spectrograms (may be shared)")
 
     # allow options to appear before/after the positional on py>=3.7
     parse = getattr(ap, "parse_intermixed_args", ap.parse_args)
@@ -88,6 +92,14 @@ def main(argv=None) -> int:
     controller = Controller(ui, proj)
     ui.show()
 
+    # optionally, resize the signal window cache
+    if args.cache_mb is not None:
+        controller.win_cache.set_budget( max( 0 , args.cache_mb ) * 2**20 )
+
+    # optionally, a different (e.g. shared) spectrogram cache folder
+    if args.spec_cache:
+        controller.spec_disk.root = args.spec_cache
+
     # optionally, attach a file list (or .edf or .annot):
     
     if args.slist_file:
@@ -24,12 +24,11 @@ import sys, traceback, os
 import pandas as pd
 from typing import List, Tuple
 
-from concurrent.futures import ThreadPoolExecutor
 
 from  ..helpers import clear_rows
+from .jobs import ANALYSIS
 
 from PySide6.QtWidgets import QPlainTextEdit, QFileDialog, QMessageBox
-from PySide6.QtCore import QMetaObject, Qt, Slot
 from PySide6.QtCore import Qt, QItemSelection, QSortFilterProxyModel, QRegularExpression
 from PySide6.QtGui import QStandardItemModel, QStandardItem
 from PySide6.QtWidgets import QAbstractItemView, QHeaderView
@@ -116,41 +115,49 @@ class AnalMixin:
         self.sb_progress.setRange(0, 0) 
         self.sb_progress.setFormat("Running…")
         self.lock_ui()
-                
-        fut = self._exec.submit(self.p.eval_lunascope, cmd)  # returns str
-                
-        def done(_f=fut):
-            try:
-                exc = _f.exception()
-                if exc is None:
-                    self._last_result = _f.result()  # cheap; already completed
-                    QMetaObject.invokeMethod(self, "_eval_done_ok", Qt.QueuedConnection)
-                else:
-                    self._last_exc = exc
-                    self._last_tb = f"{type(exc).__name__}: {exc}"
-                    #self._last_tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
-                    QMetaObject.invokeMethod(self, "_eval_done_err", Qt.QueuedConnection)
-            except Exception as cb_exc:
-                # guard against exceptions in the callback itself
-                self._last_exc = cb_exc
-                self._last_tb = f"{type(cb_exc).__name__}: {cb_exc}"
-                #self._last_tb = "".join(traceback.format_exception(type(cb_exc), cb_exc, cb_exc.__traceback__))
-                QMetaObject.invokeMethod(self, "_eval_done_err", Qt.QueuedConnection)
-                
-        fut.add_done_callback(done)
+        tok = self._start_job()
 
+        # the command may restructure the record: stop slicing it in the
+        # background first (restarted when done)
+        self._cancel_background()
+                
+        self.jobs.submit(self._eval_locked, cmd,
+                         prio=ANALYSIS, pool='luna', tok=tok, done=self._eval_done)  # returns str
+
+
+    def _eval_locked(self, cmd):
+        # worker thread: do not touch the GUI; a command that has started
+        # runs to completion (Luna cannot be interrupted mid-command)
+        with self._luna_lock:
+            return self.p.eval_lunascope( cmd )
+
+    def _eval_done(self, job):
+        # GUI thread
+        if job.cancelled:
+            self._eval_done_cancel()
+        elif job.error is not None:
+            self._last_exc = job.error
+            self._last_tb = job.tb
+            self._eval_done_err()
+        else:
+            self._last_result = job.result
+            self._eval_done_ok()
 
-    @Slot()
     def _eval_done_ok(self):
         try:
             # output to console
             self.ui.txt_out.setPlainText( self._last_result )
             # and get tables
-            tbls = self.p.strata()
+            with self._luna_lock:
+                tbls = self.p.strata()
             # show outputs from last command
             self._render_tables(tbls)
+            # signals may have been changed: drop cached windows / envelopes
+            self._instance_edited()
+            self._signals_changed()
         finally:
             self.unlock_ui()
+            self._end_job()
             self._busy = False
             self._buttons( True )
             # not potentially changed: not current
@@ -160,7 +167,6 @@ class AnalMixin:
             self.sb_progress.setVisible(False)
 
             
-    @Slot()
     def _eval_done_err(self):
         try:
             # show or log the error; pick one
@@ -169,14 +175,31 @@ class AnalMixin:
             # or: print(self._last_tb, file=sys.stderr)
         finally:
             self.unlock_ui()
+            self._end_job()
             self._busy = False
             self._buttons( True )
             self._set_render_status( self.rendered , False )
             self.sb_progress.setRange(0, 100); self.sb_progress.setValue(0)
             self.sb_progress.setVisible(False)
             # turn off any prior REPORT hides (allow that 'problem' flag may be set)
-            try: self.p.silent_proc( 'REPORT show-all' )
+            try:
+                with self._luna_lock:
+                    self.p.silent_proc( 'REPORT show-all' )
             except RuntimeError: pass
+            # background slicing was stopped before the command
+            self._build_pyramids( reset = False )
+
+
+    def _eval_done_cancel(self):
+        # cancelled before it started: nothing was run
+        self.ui.txt_out.setPlainText( "(cancelled)" )
+        self._build_pyramids( reset = False )
+        self.unlock_ui()
+        self._end_job()
+        self._busy = False
+        self._buttons( True )
+        self.sb_progress.setRange(0, 100); self.sb_progress.setValue(0)
+        self.sb_progress.setVisible(False)
 
                 
     def _buttons( self, status ):
@@ -193,34 +216,40 @@ class AnalMixin:
         self.ui.butt_load_edf.setEnabled(status)
 
             
-    def _render_tables(self, tbls):
+    def _render_tables(self, tbls, results = None):
 
         # did we add any annotations? if so, updating ssa needed 
         # (as this is where events table pulls from)
-        annots = [x for x in self.p.edf.annots() if x != "SleepStage" ]
-        self.ssa.populate( chs = [ ] , anns = annots )
-
-        # some commands don't return output
-        if tbls is not None:
-        
-            # update strata list and rewire to show
-            # data table on selection
-            self.set_tree_from_df( tbls )
+        with self._luna_lock:
+            annots = [x for x in self.p.edf.annots() if x != "SleepStage" ]
+            self.ssa.populate( chs = [ ] , anns = annots )
 
             # save, i.e. as internal results will be overwritten
             # by the HEADERS command run implicit in the updates below
-            self.results = dict()        
-            for row in tbls.itertuples(index=True):
-                v = "_".join( [ row.Command , row.Strata ] )
-                self.results[ v ] = self.p.table( row.Command, row.Strata )
-
-        # we're now finished w/ the internal Luna tables: run this command
-        # just in case the user run REPORT hide of some flavor, e.g. to
-        # make sure the silent_proc() calls work as expected, e.g. used
-        # used below
-
-        try: self.p.silent_proc( 'REPORT show-all' )
-        except RuntimeError: pass
+            # (unless already read, by the worker that ran the command)
+            if tbls is not None and results is not None:
+                self.results = dict( results )
+            elif tbls is not None:
+                self.results = dict()        
+                for row in tbls.itertuples(index=True):
+                    v = "_".join( [ row.Command , row.Strata ] )
+                    self.results[ v ] = self.p.table( row.Command, row.Strata )
+
+            # we're now finished w/ the internal Luna tables: run this command
+            # just in case the user run REPORT hide of some flavor, e.g. to
+            # make sure the silent_proc() calls work as expected, e.g. used
+            # used below
+
+            try: self.p.silent_proc( 'REPORT show-all' )
+            except RuntimeError: pass
+
+        # (incl. any new staging, for the hypnogram)
+        self._invalidate_hypno()
+
+        # some commands don't return output: update strata list and
+        # rewire to show data table on selection
+        if tbls is not None:
+            self.set_tree_from_df( tbls )
         
             
         # update main metrics tables (i.e. if new things added)
@@ -0,0 +1,130 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------
+#
+# per-instance annotation interval index
+#
+# ------------------------------------------------------------
+
+class AnnotIndex:
+    """
+    All events of an instance, as float64 start/stop arrays sorted by
+    (class, start), with per-class offsets and the longest duration per
+    class.  Window queries are two searchsorted() calls plus a mask over
+    the candidates, i.e. O(log n + k).
+    """
+
+    def __init__(self, classes=(), starts=(), stops=(), t0=0.0):
+        classes = np.asarray(classes, dtype=object)
+        starts = np.asarray(starts, dtype=np.float64)
+        stops = np.asarray(stops, dtype=np.float64)
+
+        # class codes, then sort by ( code , start )
+        if classes.size:
+            self.classes, codes = np.unique(classes.astype(str), return_inverse=True)
+        else:
+            self.classes, codes = np.empty(0, dtype=str), np.empty(0, dtype=np.intp)
+        o = np.lexsort((starts, codes))
+        self.codes = codes[o]
+        self.starts = starts[o]
+        self.stops = stops[o]
+
+        k = len(self.classes)
+        self.offsets = np.searchsorted(self.codes, np.arange(k + 1))
+        dur = self.stops - self.starts
+        self.max_dur = np.array([dur[a:b].max() if b > a else 0.0
+                                 for a, b in zip(self.offsets[:-1], self.offsets[1:])])
+        self._code = {c: i for i, c in enumerate(self.classes.tolist())}
+
+        # clock time (secs past midnight) of t = 0, for hh:mm:ss
+        self.t0 = float(t0)
+
+    @classmethod
+    def from_instance(cls, p, anns, t0=0.0):
+        """Build from p.fetch_annots() for the given classes."""
+        if len(anns) == 0:
+            return cls(t0=t0)
+        df = p.fetch_annots(anns)
+        if df is None or len(df) == 0:
+            return cls(t0=t0)
+        return cls(df['Class'].to_numpy(), df['Start'].to_numpy(), df['Stop'].to_numpy(), t0)
+
+    def __len__(self):
+        return self.starts.size
+
+    def count(self, ann):
+        c = self._code.get(ann)
+        return 0 if c is None else int(self.offsets[c + 1] - self.offsets[c])
+
+    def window(self, ann, x1, x2):
+        """(starts, stops) of events of class `ann` overlapping [x1, x2]."""
+        c = self._code.get(ann)
+        if c is None:
+            return np.empty(0), np.empty(0)
+        a, b = self.offsets[c], self.offsets[c + 1]
+        s = self.starts[a:b]
+        i0 = np.searchsorted(s, x1 - self.max_dur[c], side='left')
+        i1 = np.searchsorted(s, x2, side='right')
+        s = s[i0:i1]
+        e = self.stops[a + i0:a + i1]
+        m = e >= x1
+        return s[m], e[m]
+
+    def events(self, anns):
+        """Events of the given classes as a DataFrame (class, hms, start, dur), by start."""
+        sel = [self._code[a] for a in anns if a in self._code]
+        if not sel:
+            return pd.DataFrame(columns=["class", "hms", "start", "dur"])
+        idx = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in sel])
+        st = self.starts[idx]
+        o = np.argsort(st, kind='stable')
+        idx, st = idx[o], st[o]
+        secs = np.floor(self.t0 + st).astype(np.int64) % 86400
+        hms = pd.Series(secs // 3600).map('{:02d}'.format) + ':' + \
+              pd.Series((secs // 60) % 60).map('{:02d}'.format) + ':' + \
+              pd.Series(secs % 60).map('{:02d}'.format)
+        return pd.DataFrame({
+            "class": self.classes[self.codes[idx]],
+            "hms": hms.to_numpy(),
+            "start": st,
+            "dur": self.stops[idx] - st
+        })
+
+
+def event_density(starts, stops, x1, x2, ncols):
+    """
+    Number of events covering each of `ncols` equal columns of [x1, x2],
+    as (edges, counts); O(events + columns).
+    """
+    ncols = max(1, int(ncols))
+    edges = np.linspace(x1, x2, ncols + 1)
+    if len(starts) == 0 or x2 <= x1:
+        return edges, np.zeros(ncols, dtype=np.int64)
+    dx = (x2 - x1) / ncols
+    i0 = np.clip(np.floor((np.asarray(starts) - x1) / dx), 0, ncols - 1).astype(np.intp)
+    i1 = np.clip(np.floor((np.asarray(stops) - x1) / dx), 0, ncols - 1).astype(np.intp) + 1
+    d = np.bincount(i0, minlength=ncols + 1) - np.bincount(i1, minlength=ncols + 1)
+    return edges, np.cumsum(d[:ncols])
@@ -0,0 +1,161 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import numpy as np
+
+
+# ------------------------------------------------------------
+#
+# pixel-aware min/max decimation
+#
+# ------------------------------------------------------------
+
+def view_pixels(vb, default=1000):
+    """
+    Number of device pixels spanned by the current x-range of a ViewBox.
+    Independent of any pending (not yet applied) setRange().
+    """
+    try:
+        (xmin, xmax), _ = vb.viewRange()
+        dx, _ = vb.viewPixelSize()
+    except Exception:
+        return default
+    if not np.isfinite(dx) or dx <= 0:
+        return default
+    n = int(round((xmax - xmin) / dx))
+    return n if n > 0 else default
+
+
+def minmax_decimate(x, y, nbins):
+    """
+    Reduce (x, y) to at most 2 * nbins points: for each of `nbins`
+    equal-count buckets keep the min and the max sample, in time order,
+    so that spikes and envelopes survive the reduction.
+    `y` may also be 2-D (rows sharing `x`), in which case x is returned
+    2-D too, one row per row of y.
+    Inputs that are already small enough are returned unchanged.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = y.shape[-1]
+    nbins = int(nbins)
+    if nbins < 1 or n <= 2 * nbins:
+        return x, y
+
+    one = y.ndim == 1
+    y2 = y[None, :] if one else y
+    k = y2.shape[0]
+
+    bs = int(np.ceil(n / nbins))
+    nfull = n // bs
+    m = nfull * bs
+
+    yb = y2[:, :m].reshape(k, nfull, bs)
+    i0 = np.argmin(yb, axis=2)
+    i1 = np.argmax(yb, axis=2)
+    base = np.arange(nfull, dtype=np.intp) * bs
+
+    idx = np.empty((k, 2 * nfull), dtype=np.intp)
+    idx[:, 0::2] = base + np.minimum(i0, i1)
+    idx[:, 1::2] = base + np.maximum(i0, i1)
+
+    # ragged last bucket
+    if m < n:
+        tail = y2[:, m:]
+        t0 = m + np.argmin(tail, axis=1)
+        t1 = m + np.argmax(tail, axis=1)
+        idx = np.hstack([idx, np.minimum(t0, t1)[:, None], np.maximum(t0, t1)[:, None]])
+
+    yd = np.take_along_axis(y2, idx, axis=1)
+    if one:
+        return x[idx[0]], yd[0]
+    return x[idx], yd
+
+
+def scale01(y, mn, mx):
+    """Scale each row of 2-D `y` to 0/1 given per-row min `mn` and max `mx`."""
+    rng = (np.asarray(mx) - np.asarray(mn))[:, None]
+    ok = rng > 0
+    return np.where(ok, (y - np.asarray(mn)[:, None]) / np.where(ok, rng, 1), 0.0)
+
+
+# ------------------------------------------------------------
+#
+# multi-resolution min/max pyramid (one per channel)
+#
+# ------------------------------------------------------------
+
+class MinMaxPyramid:
+    """
+    Precomputed min/max envelopes of one whole signal at several
+    block sizes (in samples).  Each level holds the block start times
+    (relative to t0, float32) and the block min and max (float32).
+    Levels are built from each other, so `factors` must be increasing
+    multiples of one another.
+    """
+
+    def __init__(self, t, y, factors=(32, 128, 512, 2048, 8192)):
+        t = np.asarray(t, dtype=float)
+        y = np.asarray(y, dtype=np.float32)
+        self.n = int(y.size)
+        self.t0 = float(t[0]) if self.n else 0.0
+        self.levels = []  # (factor, t, lo, hi)
+
+        lo, hi, tt, f0 = y, y, t - self.t0, 1
+        for f in factors:
+            step = f // f0
+            if step < 1 or lo.size < 2 * step:
+                break
+            starts = np.arange(0, lo.size, step)
+            lo = np.minimum.reduceat(lo, starts)
+            hi = np.maximum.reduceat(hi, starts)
+            tt = tt[starts]
+            self.levels.append((f, tt.astype(np.float32), lo, hi))
+            f0 = f
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes + lo.nbytes + hi.nbytes for _, t, lo, hi in self.levels)
+
+    def window(self, x1, x2, npix):
+        """
+        Envelope over [x1, x2] from the coarsest level that still has at
+        least `npix` blocks in the window, as (t, lo, hi); None if no level
+        is fine enough (i.e. raw samples should be used instead).
+        """
+        best = None
+        a, b = x1 - self.t0, x2 - self.t0
+        for f, t, lo, hi in self.levels:
+            i0 = max(0, int(np.searchsorted(t, a, side='right')) - 1)
+            i1 = int(np.searchsorted(t, b, side='left'))
+            if i1 - i0 < npix:
+                break
+            best = (t[i0:i1].astype(float) + self.t0, lo[i0:i1], hi[i0:i1])
+        return best
+
+
+def envelope_to_xy(t, lo, hi):
+    """Interleave a (t, lo, hi) envelope into drawable x, y arrays."""
+    x = np.repeat(np.asarray(t, dtype=float), 2)
+    y = np.empty(2 * len(lo), dtype=float)
+    y[0::2] = lo
+    y[1::2] = hi
+    return x, y
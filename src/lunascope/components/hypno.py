@@ -59,7 +59,8 @@ class HypnoMixin:
             return
         
         # make hypnogram
-        ss = self.p.stages()
+        with self._luna_lock:
+            ss = self.p.stages()
         hypno(ss.STAGE, ax=self.hypnocanvas.ax)
         self.hypnocanvas.draw_idle()
         
@@ -90,9 +91,17 @@ class HypnoMixin:
         self.curr_chs = self.ui.tbl_desc_signals.checked()                   
         self.curr_anns = self.ui.tbl_desc_annots.checked()
 
-        # Luna call to get full HYPNO outputs
+        # Luna call to get full HYPNO outputs (and its tables, in the same
+        # hold of the Luna lock)
         try:
-            res = self.p.silent_proc(cmd_str)
+            with self._luna_lock:
+                res = self.p.silent_proc(cmd_str)
+                # pull bespoke output for hypno dock
+                # (as _render_tables() wipes main output)
+                df1 = self.p.table( 'HYPNO' )
+                df2 = self.p.table( 'HYPNO' , 'SS' )
+                #df3 = self.p.table( 'HYPNO' , 'C' )
+                tbls = self.p.strata()
         except Exception as e:
             QMessageBox.critical(
                 self.ui,
@@ -100,13 +109,6 @@ class HypnoMixin:
                 f"Problem running HYPNO:\n{cmd_str}\nCommand failed:\n{e}",
             )
             return
-
-        
-        # pull bespoke output for hypno dock
-        # (as _render_tables() wipes main output)
-        df1 = self.p.table( 'HYPNO' )
-        df2 = self.p.table( 'HYPNO' , 'SS' )
-        #df3 = self.p.table( 'HYPNO' , 'C' )
         
         # possible that df2 and df3 will be empty - i.e. if only W
         
@@ -148,5 +150,4 @@ class HypnoMixin:
         # this will also update annotations if any added by the hypno
         # run
 
-        tbls = self.p.strata()
         self._render_tables( tbls )
@@ -0,0 +1,104 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------
+#
+# per-instance hypnogram model (navigator)
+#
+# ------------------------------------------------------------
+
+# stage codes 0..6; also the row order of the hypnogram, bottom up
+STAGES = ('N3', 'N2', 'N1', 'R', 'W', '?', 'L')
+
+
+class HypnoModel:
+    """
+    Staging of one instance as int8 stage codes (index into STAGES, -1 =
+    none) on a fixed grid of `dt`-second columns over [0, ns]: the
+    original staging (all epochs) and the staging of unmasked epochs.
+    Renders each as an RGBA image, for a single ImageItem per lane.
+    """
+
+    # hypnogram image: 1/120 units per row, so that the stage rows (1/15
+    # apart) and bar height (0.225) fall on whole rows
+    HYPNO_ROWS = 75
+    HYPNO_STEP = 8
+    HYPNO_BAR = 27
+
+    def __init__(self, ns, dt=30.0):
+        self.ns = float(ns)
+        self.dt = float(dt)
+        self.ncols = max(1, int(np.ceil(self.ns / self.dt)))
+        self.orig = np.full(self.ncols, -1, dtype=np.int8)
+        self.masked = None   # not yet computed (needs STAGE)
+
+    @property
+    def width(self):
+        return self.ncols * self.dt
+
+    def codes(self, starts, stops, classes):
+        """Stage codes per column for events (no longer than dt) w/ classes."""
+        out = np.full(self.ncols, -1, dtype=np.int8)
+        if len(starts) == 0:
+            return out
+        c = pd.Series(classes).map({s: i for i, s in enumerate(STAGES)}).fillna(-1).to_numpy(np.int8)
+        i0 = np.clip(np.floor(np.asarray(starts, float) / self.dt), 0, self.ncols - 1).astype(np.intp)
+        i1 = np.clip(np.ceil(np.asarray(stops, float) / self.dt) - 1, 0, self.ncols - 1).astype(np.intp)
+        i1 = np.maximum(i0, i1)
+        # an event may straddle two columns
+        out[i1] = c
+        out[i0] = c
+        return out
+
+    def set_original(self, starts, stops, classes):
+        self.orig = self.codes(starts, stops, classes)
+
+    def set_masked(self, starts, stops, classes):
+        self.masked = self.codes(starts, stops, classes)
+
+    def hypno_image(self, rgba):
+        """(ncols, HYPNO_ROWS, 4) image of the original staging; `rgba` maps stage -> (r,g,b,a)."""
+        img = np.zeros((self.ncols, self.HYPNO_ROWS, 4), dtype=np.uint8)
+        for k, s in enumerate(STAGES):
+            m = self.orig == k
+            if s in rgba and m.any():
+                r0 = k * self.HYPNO_STEP
+                img[m, r0:r0 + self.HYPNO_BAR] = rgba[s]
+        return img
+
+    def lane_image(self, rgba, seg_rgba):
+        """
+        (ncols, 12, 4) image at 1/100 units per row: unmasked epochs as a
+        segment bar (rows 0-4) and their stages (rows 7-11).
+        """
+        img = np.zeros((self.ncols, 12, 4), dtype=np.uint8)
+        if self.masked is None:
+            return img
+        img[self.masked >= 0, 0:5] = seg_rgba
+        for k, s in enumerate(STAGES):
+            m = self.masked == k
+            if s in rgba and m.any():
+                img[m, 7:12] = rgba[s]
+        return img
@@ -0,0 +1,200 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import heapq
+import itertools
+import threading
+
+from PySide6.QtCore import QObject, Signal
+
+
+# ------------------------------------------------------------
+#
+# cooperative cancellation of worker-thread jobs
+#
+# ------------------------------------------------------------
+
+class Cancelled(Exception):
+    """Raised by CancelToken.check() once the job has been cancelled."""
+
+
+class CancelToken:
+    """
+    Shared flag between the GUI thread (cancel()) and a job running on a
+    worker thread, which polls it between units of work (e.g. channel
+    groups, filter chunks).  A Luna call that is already running is not
+    interrupted: the job stops at its next check.
+    """
+
+    def __init__(self):
+        self._ev = threading.Event()
+
+    def cancel(self):
+        self._ev.set()
+
+    @property
+    def cancelled(self):
+        return self._ev.is_set()
+
+    def check(self):
+        if self._ev.is_set():
+            raise Cancelled()
+
+
+# ------------------------------------------------------------
+#
+# prioritized job scheduler w/ per-kind worker pools
+#
+# ------------------------------------------------------------
+
+# priority classes (lower runs first)
+INTERACTIVE, PREFETCH, ANALYSIS, IDLE = range(4)
+
+
+class Job:
+    """
+    A unit of work: fn(*args) run on a worker of `pool`.  On completion
+    exactly one of result / error / cancelled is set and the job is
+    passed to done(job) on the GUI thread.
+    """
+
+    __slots__ = ("fn", "args", "prio", "pool", "key", "tok", "done",
+                 "state", "result", "error", "tb", "cancelled")
+
+    def __init__(self, fn, args, prio, pool, key, tok, done):
+        self.fn = fn
+        self.args = args
+        self.prio = prio
+        self.pool = pool
+        self.key = key
+        self.tok = tok
+        self.done = done
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.tb = None
+        self.cancelled = False
+
+
+class JobScheduler(QObject):
+    """
+    Worker pools by kind of work, e.g. 'luna' (calls into the attached
+    instance, which release the GIL but are serialized) and 'numpy'; each
+    pool takes the queued job of best priority class, FIFO within a
+    class.  Jobs submitted with a key already queued or running are not
+    added again: the pending job is returned, raised to the new priority
+    if better and, if still queued, taking the new call, token and done
+    (so a resubmission revives a job whose old token was cancelled).  A running
+    job whose token was cancelled gives its key up to the new job.  Every finished job is emitted once on `finished`, which
+    is delivered on the GUI thread.
+    """
+
+    finished = Signal(object)
+
+    def __init__(self, pools, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._cv = { }
+        self._queue = { }
+        self._keyed = { }
+        self._seq = itertools.count()
+        self._stop = False
+        for pool, n in pools.items():
+            self._cv[pool] = threading.Condition(self._lock)
+            self._queue[pool] = [ ]
+            for i in range(n):
+                threading.Thread(target=self._worker, args=(pool,),
+                                 name=f"jobs-{pool}-{i}", daemon=True).start()
+
+    def submit(self, fn, *args, prio=ANALYSIS, pool="luna", key=None, tok=None, done=None):
+        with self._lock:
+            if key is not None:
+                job = self._keyed.get(key)
+                if job is not None and job.state == "running" and \
+                   job.tok is not None and job.tok.cancelled and tok is not job.tok:
+                    # stopping: not the work now asked for
+                    job = None
+                if job is not None:
+                    if job.state == "queued":
+                        # the new call as a whole (its args may hold the token)
+                        job.fn = fn
+                        job.args = args
+                        if tok is not None:
+                            job.tok = tok
+                        if done is not None:
+                            job.done = done
+                        if prio < job.prio:
+                            job.prio = prio
+                            heapq.heappush(self._queue[job.pool], (prio, next(self._seq), job))
+                            self._cv[job.pool].notify()
+                    return job
+            job = Job(fn, args, prio, pool, key, tok, done)
+            if key is not None:
+                self._keyed[key] = job
+            heapq.heappush(self._queue[pool], (prio, next(self._seq), job))
+            self._cv[pool].notify()
+        return job
+
+    def pending(self, key):
+        with self._lock:
+            return key in self._keyed
+
+    def shutdown(self):
+        with self._lock:
+            self._stop = True
+            for cv in self._cv.values():
+                cv.notify_all()
+
+    def _worker(self, pool):
+        q = self._queue[pool]
+        cv = self._cv[pool]
+        while True:
+            with self._lock:
+                while not self._stop and not q:
+                    cv.wait()
+                if self._stop:
+                    return
+                prio, _, job = heapq.heappop(q)
+                # stale entry of a job since raised in priority
+                if job.state != "queued" or prio != job.prio:
+                    continue
+                job.state = "running"
+            self._run(job)
+
+    def _run(self, job):
+        try:
+            if job.tok is not None:
+                job.tok.check()
+            job.result = job.fn(*job.args)
+        except Cancelled:
+            job.cancelled = True
+        except Exception as e:
+            job.error = e
+            job.tb = f"{type(e).__name__}: {e}"
+        with self._lock:
+            job.state = "done"
+            if job.key is not None and self._keyed.get(job.key) is job:
+                del self._keyed[job.key]
+        try:
+            self.finished.emit(job)
+        except RuntimeError:
+            # scheduler already deleted (shutting down)
+            pass
@@ -41,7 +41,8 @@ class MasksMixin:
 
         anns = [ '<none>' ]
         
-        anns.extend( self.p.edf.annots() )
+        with self._luna_lock:
+            anns.extend( self.p.edf.annots() )
         
         self.ui.combo_ifnot_mask.addItems( anns )
 
@@ -85,16 +86,23 @@ class MasksMixin:
         self.curr_chs = self.ui.tbl_desc_signals.checked()
         self.curr_anns = self.ui.tbl_desc_annots.checked()
         
-        # run MASK
+        # run MASK (after stopping background slices of the record as is)
 
-        self.p.eval( 'MASK ' + msk + ' & RE ' )
+        self._cancel_background()
+        with self._luna_lock:
+            self.p.eval( 'MASK ' + msk + ' & RE ' )
 
         # update the things that need updating
 
         self._set_render_status( self.rendered , False )
+        self._invalidate_hypno()
         self._update_metrics()
-        self._update_pg1()
+        self._request_pg1()
         
         self.ui.tbl_desc_signals.set_checked_by_labels( self.curr_chs )
         self.ui.tbl_desc_annots.set_checked_by_labels( self.curr_anns )
         self._update_instances( self.curr_anns )
+
+        # record restructured: drop cached windows / envelopes
+        self._instance_edited( 'MASK ' + msk )
+        self._signals_changed()
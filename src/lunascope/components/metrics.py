@@ -34,6 +34,7 @@ from PySide6.QtCore import QTimer
         
 from ..helpers import sort_df_by_list
 from .tbl_funcs import add_combo_column, add_check_column, attach_comma_filter
+from .annotindex import AnnotIndex
 
 
 # drop-in: minimal changes to make combo editors persist across filtering
@@ -151,9 +152,20 @@ class MetricsMixin:
         # ------------------------------------------------------------
         # EDF header metrics --> status bar
         
-        self.p.silent_proc( 'HEADERS & EPOCH align' )
-
-        df = self.p.table( 'EPOCH' )
+        # all Luna reads in one hold of the lock (workers may be slicing,
+        # or running commands that replace the result tables)
+        with self._luna_lock:
+            self.p.silent_proc( 'HEADERS & EPOCH align' )
+            df_epoch = self.p.table( 'EPOCH' )
+            df_hdr = self.p.table( 'HEADERS' )
+            edf_id = self.p.id()
+            edf_na = self.p.annots().size
+            hdr = self.p.headers()
+            df_ch = self.p.table('HEADERS', 'CH')
+            df_annots = self.p.annots()
+            self.ssa_anns = self.p.edf.annots()
+
+        df = df_epoch
         try:
             edf_ne = df.iloc[0, df.columns.get_loc('NE')]
         except KeyError:
@@ -161,12 +173,10 @@ class MetricsMixin:
             self._refresh()
             return        
         
-        df = self.p.table( 'HEADERS' )
-        edf_id = self.p.id()
+        df = df_hdr
         rec_dur_hms = df.iloc[0, df.columns.get_loc('REC_DUR_HMS')]
         tot_dur_hms = df.iloc[0, df.columns.get_loc('TOT_DUR_HMS')]
         edf_type = df.iloc[0, df.columns.get_loc('EDF_TYPE')]        
-        edf_na = self.p.annots().size
         edf_ns = df.iloc[0, df.columns.get_loc('NS')]
         edf_starttime = df.iloc[0, df.columns.get_loc('START_TIME')]
         edf_startdate = df.iloc[0, df.columns.get_loc('START_DATE')]
@@ -181,8 +191,6 @@ class MetricsMixin:
         # --------------------------------------------------------------------------------
         # get units (for plot labels) and sample rates (for filters)
 
-        hdr = self.p.headers()
-
         if hdr is not None:
             self.units = dict( zip( hdr.CH , hdr.PDIM ) )
             self.srs   = dict( zip( hdr.CH , hdr.SR ) )
@@ -195,7 +203,7 @@ class MetricsMixin:
         # populate signal box
 
 
-        df = self.p.table('HEADERS', 'CH')
+        df = df_ch
         if len(df.index) > 0:
             df = df[['CH', 'PDIM', 'SR']]
         else:
@@ -349,7 +357,7 @@ class MetricsMixin:
                     self.ss.clear_filter(ch_label)
 
             self._clear_pg1()
-            self._update_scaling() # calls _update_pg1() 
+            self._update_scaling() # requests a pg1 redraw
 
 
         # add wiring
@@ -482,7 +490,7 @@ class MetricsMixin:
 
 
         # SOURCE model
-        df = self.p.annots()
+        df = df_annots
 
         # re-order channels based on a cmap?                                                                                             
         if self.cmap_list:
@@ -536,16 +544,25 @@ class MetricsMixin:
         # redo original population of ssa
 
         # track all original annots (to keep the same y-axes)
-        self.ssa_anns = self.p.edf.annots()
         self.ssa_anns_lookup = {v: i for i, v in enumerate(self.ssa_anns)}
         
         # but initialize a separate ss for annotations only
         # for lookups (event instance listing)
-        self.ssa = lp.segsrv( self.p )
-        self.ssa.populate( chs = [ ] , anns = self.ssa_anns )
+        with self._luna_lock:
+            self.ssa = lp.segsrv( self.p )
+            self.ssa.populate( chs = [ ] , anns = self.ssa_anns )
         self.ssa.set_annot_format6( False )  # pyqtgraph vs plotly
         self.ssa.set_clip_xaxes( False )
         self.ssa.window(self.last_x1, self.last_x2) 
+
+        # and a client-side index of all events, for windowing and listing
+        try:
+            hh, mm, ss = ( int(x) for x in str( edf_starttime ).split('.')[:3] )
+            t0 = hh * 3600 + mm * 60 + ss
+        except ValueError:
+            t0 = 0
+        with self._luna_lock:
+            self.annot_idx = AnnotIndex.from_instance( self.p , self.ssa_anns , t0 )
         
         # populate here, as used by plot_simple (prior to render)
         self.ss_anns = self.ui.tbl_desc_annots.checked()
@@ -561,22 +578,8 @@ class MetricsMixin:
 
     def _update_instances(self, anns):
 
-        # request w/ hms and duration also (True)                                                                                                                                                                                           
-        evts = pd.Series(self.ssa.get_all_annots(anns, True ))
-	
-        # always define df                                                                                                                                                                                                                  
-        df = pd.DataFrame(columns=["class", "hms", "start", "dur"])
-
-        if len(evts) != 0:
-            a = evts.str.rsplit("| ", n=3, expand=True)
-            b = a[1].str.split("-", n=1, expand=True)
-
-            df = pd.DataFrame({
-                "class": a[0].str.strip(),
-                "hms": a[2].str.strip(),
-                "start": pd.to_numeric(b[0], errors="coerce"),
-                "dur": pd.to_numeric(a[3], errors="coerce")
-            }).sort_values("start", ascending=True, na_position="last")
+        # class, hh:mm:ss, start and duration, from the annotation index
+        df = self.annot_idx.events( anns )
         self.events_model = self.df_to_model(df)
         
         self.events_table_proxy = QSortFilterProxyModel(self)
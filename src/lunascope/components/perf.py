@@ -0,0 +1,135 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import csv
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+
+# ------------------------------------------------------------
+#
+# render-stage timers and counters (off unless enabled)
+#
+# ------------------------------------------------------------
+
+class _Stage:
+    __slots__ = ("perf", "name", "t0")
+
+    def __init__(self, perf, name):
+        self.perf = perf
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.perf.add(self.name, 1000.0 * (time.perf_counter() - self.t0))
+        return False
+
+
+class PerfStats:
+    """
+    Rolling per-frame timings (ms) of named stages and per-frame counters
+    (e.g. points drawn, items updated), over the last `window` frames.
+    Stage times within a frame are summed; end_frame() closes a frame.
+    Times measured outside a frame (e.g. Qt painting) go in via record().
+    When disabled, stage() is a no-op context and the rest do nothing.
+    """
+
+    _off = nullcontext()
+
+    def __init__(self, window=200):
+        self.enabled = False
+        self.window = window
+        self.times = {}      # stage -> deque of ms
+        self.counters = {}   # counter -> deque of per-frame values
+        self._t = {}         # stage times, frame in progress
+        self._n = {}         # counters, frame in progress
+
+    def stage(self, name):
+        return _Stage(self, name) if self.enabled else self._off
+
+    def add(self, name, ms):
+        if self.enabled:
+            self._t[name] = self._t.get(name, 0.0) + ms
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self._n[name] = self._n.get(name, 0) + n
+
+    def record(self, name, ms):
+        if self.enabled:
+            self._push(self.times, name, ms)
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        for name, ms in self._t.items():
+            self._push(self.times, name, ms)
+        for name, n in self._n.items():
+            self._push(self.counters, name, n)
+        self._t = {}
+        self._n = {}
+
+    def _push(self, src, name, v):
+        d = src.get(name)
+        if d is None:
+            d = src[name] = deque(maxlen=self.window)
+        d.append(v)
+
+    def reset(self):
+        self.times.clear()
+        self.counters.clear()
+        self._t = {}
+        self._n = {}
+
+    def summary(self):
+        """Rows of (name, kind, n, last, p50, p90, p99, max)."""
+        rows = []
+        for kind, src in (("ms", self.times), ("count", self.counters)):
+            for name, d in src.items():
+                if not d:
+                    continue
+                a = np.fromiter(d, dtype=float)
+                p50, p90, p99 = np.percentile(a, [50, 90, 99])
+                rows.append((name, kind, a.size, a[-1], p50, p90, p99, a.max()))
+        return rows
+
+    def text(self):
+        """Fixed-width summary for the on-canvas overlay."""
+        lines = [f"{'stage':<18}{'last':>8}{'p50':>8}{'p90':>8}{'p99':>8}"]
+        for name, kind, n, last, p50, p90, p99, mx in self.summary():
+            if kind == "count":
+                lines.append(f"{name:<18}{last:>8.0f}{p50:>8.0f}{p90:>8.0f}{p99:>8.0f}")
+            else:
+                lines.append(f"{name:<18}{last:>8.2f}{p50:>8.2f}{p90:>8.2f}{p99:>8.2f}")
+        return "\n".join(lines)
+
+    def to_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["stage", "unit", "n", "last", "p50", "p90", "p99", "max"])
+            for row in self.summary():
+                w.writerow([row[0], row[1], row[2]] + [f"{v:.4f}" for v in row[3:]])
@@ -22,8 +22,6 @@
 import lunapi as lp
 import numpy as np
 
-from matplotlib.patches import Rectangle
-from matplotlib.collections import PatchCollection
 from matplotlib import colormaps
 from matplotlib import pyplot as plt
 
@@ -83,17 +81,28 @@ def spec(ss, e=None, ax=None, *, title=None, xsize=20, ysize=2, clear=True):
 # plot a Hjorthgram
 
 @staticmethod
-def plot_hjorth( ch , ax , p , gui ):
-
-    ax.clear()
-
-    # get stats
+def hjorth_stats( p , ch ):
+    """Per-epoch ( START , H1 , H2 , H3 ) arrays for channel ch (caller holds any Luna lock)."""
     p.eval( 'EPOCH dur=30 verbose & SIGSTATS epoch sig=' + ch ) 
     df = p.table( 'SIGSTATS' , 'CH_E' ) 
     dt = p.table( 'EPOCH' , 'E' )  
+    return ( dt["START"].to_numpy(float) ,
+             df["H1"].to_numpy(float) ,
+             df["H2"].to_numpy(float) ,
+             df["H3"].to_numpy(float) )
+
 
-    # times
-    x = dt["START"].to_numpy(float)
+@staticmethod
+def hjorth_image( stats , w , nrows = 100 ):
+    """
+    ( ncols , 2 * nrows , 4 ) uint8 RGBA image, a column per 30-s epoch
+    (gaps left blank): bars of height H1 up from the midline colored by
+    H2, and down by H3 (winsorized at w, scaled to 0..1).
+    """
+
+    x, h1, h2, h3 = stats
+    if len(x) == 0:
+        return np.zeros( ( 0 , 2 * nrows , 4 ) , dtype = np.uint8 )
     
     def _norm(arr: np.ndarray) -> np.ndarray:
         mn = np.nanmin(arr)
@@ -107,69 +116,22 @@ def plot_hjorth( ch , ax , p , gui ):
 
 
     # standardize Hjorth values
-    w = gui.spin_win.value()
-    y1 = _norm(lp.winsorize( df["H1"].to_numpy(float) , limits = [w,w] ))
-    y2 = _norm(lp.winsorize( df["H2"].to_numpy(float) , limits = [w,w] ))
-    y3 = _norm(lp.winsorize( df["H3"].to_numpy(float) , limits = [w,w] ))
+    y1 = _norm(lp.winsorize( h1 , limits = [w,w] ))
+    y2 = _norm(lp.winsorize( h2 , limits = [w,w] ))
+    y3 = _norm(lp.winsorize( h3 , limits = [w,w] ))
 
     # color axes
-    idx2 = np.clip(np.rint(y2 * 99).astype(int), 0, 99)
-    idx3 = np.clip(np.rint(y3 * 99).astype(int), 0, 99)
-    colors2 = colormaps["turbo"](y2)  # y2 in [0,1]
-    colors3 = colormaps["turbo"](y3)
+    colors2 = colormaps["turbo"](y2, bytes = True)  # y2 in [0,1]
+    colors3 = colormaps["turbo"](y3, bytes = True)
 
-    midy = 0
     elen = 30
-
-    rects_top = [Rectangle((xi, midy), elen, hi) for xi, hi in zip(x, y1)]
-    rects_bot = [Rectangle((xi, midy - hi), elen, hi) for xi, hi in zip(x, y1)]
-    pc_top = PatchCollection(rects_top, facecolors=colors2, edgecolor="none", linewidth=0)
-    pc_bot = PatchCollection(rects_bot, facecolors=colors3, edgecolor="none", linewidth=0)
-    ax.add_collection(pc_top)
-    ax.add_collection(pc_bot)
-
-
-    fig = ax.figure
-    # no auto layout padding
-    fig.set_constrained_layout(False)      # or: fig.set_layout_engine(None)
-    fig.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0, hspace=0)
-    # make the axes fill the figure
-    ax.set_position([0, 0, 1, 1])
-    # no data margins or axes decorations
-    ax.margins(x=0, y=0)
-    ax.set_axis_off()
-
-    ax.set_xlim(0, max(x))
-    ax.set_ylim(-1, 1)
-    ax.margins(0)
-    ax.axis("off")
-    ax.figure.patch.set_facecolor("white")
-    ax.set_aspect("auto")
-    
-    return ax
-
-
-# --------------------------------------------------------------------------------
-# plot a spectrogram
-        
-@staticmethod
-def plot_spec( xi,yi,zi, ch, minf, maxf, ax , gui, clear = True):
-
-    created = False
-    if ax is None:
-        fig, ax = plt.subplots(figsize=(xsize, ysize))
-        created = True
-    elif clear:
-        ax.clear()
-        
-    if len(xi) == 0: return ax
-
-    ax.set_xlabel('Epoch')
-    ax.set_ylabel('Frequency (Hz)')
-    ax.set( ylim=(minf,maxf) )
-    p1 = ax.pcolormesh(xi, yi, zi, cmap = 'turbo' )
-    ax.margins(x=0, y=0.2)
-    return ax  
+    col = np.rint( x / elen ).astype(int)
+    ncols = int( col.max() ) + 1
+    up = ( ( np.arange(nrows) + 0.5 ) / nrows )[None,:] <= y1[:,None]    # ( E , nrows )
+    img = np.zeros( ( ncols , 2 * nrows , 4 ) , dtype = np.uint8 )
+    img[col, nrows:] = np.where( up[...,None] , colors2[:,None,:] , 0 )
+    img[col, :nrows] = np.where( up[:,::-1,None] , colors3[:,None,:] , 0 )
+    return img
 
 
 @staticmethod
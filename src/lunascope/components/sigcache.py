@@ -0,0 +1,114 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import threading
+from collections import OrderedDict
+
+
+# ------------------------------------------------------------
+#
+# byte-budgeted LRU of window slices (shared by GUI and prefetch threads)
+#
+# ------------------------------------------------------------
+
+def _nbytes(value):
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return int(getattr(value, "nbytes", 0))
+
+
+class WindowCache:
+    """
+    Thread-safe LRU mapping a window key to a tuple of NumPy arrays.
+    Least recently used entries are dropped once the arrays held exceed
+    `max_bytes`; hits and misses are counted for diagnostics.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._d = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._d)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._d
+
+    def get(self, key):
+        with self._lock:
+            v = self._d.get(key)
+            if v is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._d.move_to_end(key)
+            return v[0]
+
+    def put(self, key, value):
+        # True if stored (False: larger than the whole budget)
+        sz = _nbytes(value)
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            # never hold a single entry larger than the whole budget
+            if sz > self.max_bytes:
+                return False
+            self._d[key] = (value, sz)
+            self.nbytes += sz
+            self._evict()
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._d:
+            _, (_, sz) = self._d.popitem(last=False)
+            self.nbytes -= sz
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            n = self.hits + self.misses
+            return { "entries": len(self._d),
+                     "bytes": self.nbytes,
+                     "budget": self.max_bytes,
+                     "hits": self.hits,
+                     "misses": self.misses,
+                     "hit_rate": self.hits / n if n else 0.0 }
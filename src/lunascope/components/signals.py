@@ -23,17 +23,25 @@ import lunapi as lp
 
 import pandas as pd
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
-from scipy.signal import butter, sosfilt
+from scipy.signal import butter, sosfilt, sosfilt_zi
 
-from concurrent.futures import ThreadPoolExecutor
-from PySide6.QtCore import QMetaObject, Qt, Slot
+import sys
+import time
+from PySide6.QtCore import Qt, QTimer
 
 import pyqtgraph as pg
-from PySide6.QtWidgets import QProgressBar, QMessageBox
+from PySide6.QtWidgets import QProgressBar, QMessageBox, QLabel, QFileDialog
 from PySide6.QtCore import QSignalBlocker
 
+from .decimate import minmax_decimate, view_pixels, MinMaxPyramid, envelope_to_xy, scale01
+from .sigcache import WindowCache
+from .perf import PerfStats
+from .annotindex import AnnotIndex, event_density
+from .hypnomodel import HypnoModel, STAGES
+from .jobs import CancelToken, INTERACTIVE, PREFETCH, IDLE
+
 class SignalsMixin:
 
     def _init_signals(self):
@@ -90,6 +98,63 @@ class SignalsMixin:
         self.last_x1 = 0
         self.last_x2 = 30
 
+        # frame scheduler: all pg1 redraw requests are coalesced into at
+        # most one redraw per frame; only the latest window is drawn
+        self._frame_ms = 16
+        self._frame_timer = QTimer( self )
+        self._frame_timer.setSingleShot( True )
+        self._frame_timer.timeout.connect( self._frame )
+        self._frame_last = 0.0
+        self._pending_win = None
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+        self.perf_skipped = 0
+
+        # render-stage timers (off until the HUD is shown) + overlay on pg1
+        self.perf = PerfStats()
+        self.perf_hud = QLabel( self.ui.pg1 )
+        self.perf_hud.setStyleSheet( "QLabel { background: rgba(0,0,0,170); color: rgb(180,255,180); padding: 4px; }" )
+        self.perf_hud.setFont( QtGui.QFontDatabase.systemFont( QtGui.QFontDatabase.FixedFont ) )
+        self.perf_hud.setAttribute( Qt.WA_TransparentForMouseEvents )
+        self.perf_hud.move( 8 , 8 )
+        self.perf_hud.hide()
+        self._perf_hud_t = 0.0
+
+        # annotation events (rebuilt per instance, see _update_metrics);
+        # tracks above this many events per pixel are drawn as density
+        self.annot_idx = AnnotIndex()
+        self.annot_lod = 0.5
+
+        # optional event-density lanes on the navigator
+        self.nav_density = False
+        self.nav_lanes = [ ]
+
+        # progressive Render: channel groups done on the worker
+        self._render_req = 0
+
+        # signal-state generation: bumped whenever the attached record
+        # (or its signals) change, invalidating anything derived from them
+        self._sig_gen = 0
+
+        # cancels the chunked background jobs of the current generation
+        self._bg_tok = CancelToken()
+
+        # per-instance min/max pyramids (built in the background)
+        self.pyramids = { }
+
+        # window slices for the pre-Render view, plus read-ahead
+        self.win_cache = WindowCache( 256 * 2**20 )
+        self._prefetch_n = 3
+        self._prefetch_tok = CancelToken()
+
+        # whole-record band-filtered signals (display filters), built
+        # once per ( channel , band ) in the background
+        self.flt_cache = WindowCache( 512 * 2**20 )
+
+        # ... and those that could not be kept there (too large, or evicted
+        # before use): these are filtered window by window instead
+        self.flt_nocache = set()
+
         
     # --------------------------------------------------------------------------------
     #
@@ -103,7 +168,7 @@ class SignalsMixin:
         # ------------------------------------------------------------
         # initiate segsrv 
         
-        self.ss = lp.segsrv( self.p )
+        self.ss = SegsrvGroup( lp.segsrv( self.p ) )
                 
         # view 'epoch' is fixed at 30 seconds
         scope_epoch_sec = 30 
@@ -122,8 +187,9 @@ class SignalsMixin:
         # ------------------------------------------------------------
         # set lights out/on
 
-        res = self.p.silent_proc( 'HEADERS' )
-        df = self.p.table( 'HEADERS' )
+        with self._luna_lock:
+            res = self.p.silent_proc( 'HEADERS' )
+            df = self.p.table( 'HEADERS' )
 
         start_date = str(df["START_DATE"].iloc[0])
         start_time = str(df["START_TIME"].iloc[0])
@@ -178,48 +244,16 @@ class SignalsMixin:
         h.setXRange(0,self.ns)
         h.setYRange(0,1)
 
-        # get full, original staging from annotations
-        stgs = [ 'N1' , 'N2' , 'N3' , 'R' , 'W' , '?' , 'L' ] 
-
-        stgns = {'N1': 0.13333333333333333,
-                 'N2': 0.06666666666666667,
-                 'N3': 0.0,
-                'R': 0.2,
-                'W': 0.26666666666666666,
-                '?': 0.3333333333333333,
-                'L': 0.4}
-
-        stg_evts = self.p.fetch_annots( stgs , 30 )
-        
-        if len( stg_evts ) != 0:
-            starts = stg_evts[ 'Start' ].to_numpy()
-            stops = stg_evts[ 'Stop' ].to_numpy()
-            cols = [ self.stgcols_hex[c] for c in stg_evts['Class'].tolist() ]
-            ys = [ stgns[c] for c in stg_evts['Class'].tolist() ]
-
-            # ensure we'll see
-            starts, stops = _ensure_min_px_width( vb, starts, stops, px=1)  # 1-px minimum
-
-            # keep in seconds
-            x = ( ( starts + stops ) / 2.0 ) 
-            w = ( stops - starts ) 
-
-            brushes = [QtGui.QColor(c) for c in cols]   # e.g. "#20B2DA"
-            pens    = [None]*len(x)
-            
-            bins = defaultdict(list)
-            for xi, wi, yi, ci in zip(x.tolist(), w.tolist(), ys, cols):
-                bins[ci].append((xi, wi, yi ))
-
-            for ci, items in bins.items():
-                xi, wi, yi = zip(*items)
-                bg = pg.BarGraphItem(
-                    x=list(xi), width=list(wi), y0=[ x+0.25 for x in list(yi) ], height=[0.225]*len(xi), 
-                    brush=QtGui.QColor(ci), pen=None )                
-                bg.setZValue(-10)
-                bg.setAcceptedMouseButtons(QtCore.Qt.NoButton)
-                bg.setAcceptHoverEvents(False)
-                pi.addItem(bg)
+        # full, original staging from annotations (cached per instance),
+        # drawn as one image
+        m = self._hypno_model()
+        img = pg.ImageItem( m.hypno_image( self._stage_rgba() ) , autoDownsample=False )
+        img.setRect( QtCore.QRectF( 0 , 0.25 , m.width , m.HYPNO_ROWS / 120.0 ) )
+        img.setZValue(-10)
+        img.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        img.setAcceptHoverEvents(False)
+        pi.addItem(img)
+        self.updated_hypno = [ ]
 
         # segment plotter
         pi.plot([0, self.ns], [0.01, 0.01], pen=pg.mkPen(0, 0, 0 ))
@@ -268,132 +302,140 @@ class SignalsMixin:
         pi = h.getPlotItem()
         vb = pi.getViewBox()        
         
-        # hypnogram vesion 2
-        # get staging (in units no larger than 30 seconds)
-        stgs = [ 'N1' , 'N2' , 'N3' , 'R' , 'W' , '?' , 'L' ] 
-        stg_evts = self.p.fetch_annots( stgs , 30 )
+        # staging of unmasked epochs: only (re)computed when annotations
+        # or masks have changed
+        m = self._hypno_model()
 
-        # check staging for problems
+        if m.masked is None:
 
-        has_staging = self._has_staging( False ) # F = do not require >1 stage
+            # check staging for problems
+            has_staging = self._has_staging( False ) # F = do not require >1 stage
 
-#        print( 'has staging' , has_staging )
-#        if not has_staging:
-#            print( 'no staging??')
-#            return 
-                
-        # get staging (in units no larger than 30 seconds)
-        # use STAGES here so that we only get the unmasked datapoints
+            # get staging (in units no larger than 30 seconds)
+            # use STAGES here so that we only get the unmasked datapoints
 
-        try:
-            res = self.p.silent_proc( 'EPOCH align verbose & STAGE' )
-        except (RuntimeError) as e:
-            QMessageBox.critical(
-                self.ui,
-                "Error running STAGE: checking for overlapping staging annotations",
-                "Problem with annotations: check for overlapping stage annotations"
-            )
-            return
-        
-        if "EPOCH: E" in res:
-            df1 = self.p.table( 'EPOCH' , 'E' )
-            df1 = df1[ ['E' , 'START' , 'STOP' ] ] 
-        else:
-            df1 = None
-            df1 = pd.DataFrame( columns = [ "E", "OSTAGE" ] )
-      
-        # if no valid staging, will not have any 'STAGE' output
-        tbls = self.p.strata()
-        has_staging = (tbls["Command"] == "STAGE").any()
-        if has_staging:
-            df2 = self.p.table( 'STAGE' , 'E' )
-            df2 = df2[ ['E' , 'OSTAGE' ] ]
-        else:
-            df2 = pd.DataFrame({
-                "E": df1["E"],
-                "OSTAGE": "?"
-            })
-
-        # merge
-        df = pd.merge(df1, df2, on="E", how="inner")
-
-        if len( df ) != 0:
-            starts = df[ 'START' ].to_numpy()
-            stops = df[ 'STOP' ].to_numpy()
-            cols = [ self.stgcols_hex[c] for c in df['OSTAGE'].tolist() ]
-
-            # ensure we'll see
-            starts, stops = _ensure_min_px_width( vb, starts, stops, px=1)  # 1-px minimum
-            
-            # keep in seconds
-            x = ( ( starts + stops ) / 2.0 ) 
-            w = ( stops - starts ) 
+            # (command and its tables in one hold of the Luna lock)
+            with self._luna_lock:
+                try:
+                    res = self.p.silent_proc( 'EPOCH align verbose & STAGE' )
+                except (RuntimeError) as e:
+                    res = None
+                if res is not None:
+                    df1 = self.p.table( 'EPOCH' , 'E' ) if "EPOCH: E" in res else None
+                    # if no valid staging, will not have any 'STAGE' output
+                    tbls = self.p.strata()
+                    has_staging = (tbls["Command"] == "STAGE").any()
+                    df2 = self.p.table( 'STAGE' , 'E' ) if has_staging else None
+
+            if res is None:
+                QMessageBox.critical(
+                    self.ui,
+                    "Error running STAGE: checking for overlapping staging annotations",
+                    "Problem with annotations: check for overlapping stage annotations"
+                )
+                return
+
+            if df1 is not None:
+                df1 = df1[ ['E' , 'START' , 'STOP' ] ] 
+            else:
+                df1 = pd.DataFrame( columns = [ "E", "START" , "STOP" ] )
 
-            brushes = [QtGui.QColor(c) for c in cols]   # e.g. "#20B2DA"
-            pens    = [None]*len(x)
-            
-            bins = defaultdict(list)
-            for xi, wi, ci in zip(x.tolist(), w.tolist(), cols):
-                bins[ci].append((xi, wi ))
-
-            # clear if previously added
-            if getattr(self, "updated_hypno", None) is not None:
-                for it in self.updated_hypno:
-                    pi.removeItem(it)
-                self.updated_hypno.clear()
-
-            self.updated_hypno = [ ] 
-
-            # staging
-            for ci, items in bins.items():
-                xi, wi = zip(*items)
-                bg = pg.BarGraphItem(
-                    x=list(xi), width=list(wi), y0=[0.1] * len(xi), height=[0.05]*len(xi), 
-                    brush=QtGui.QColor(ci), pen=None )                
-                bg.setZValue(-10)
-                bg.setAcceptedMouseButtons(QtCore.Qt.NoButton)
-                bg.setAcceptHoverEvents(False)
-                pi.addItem(bg)
-                self.updated_hypno.append(bg)
-
-            # simple segment plot
-            for ci, items in bins.items():
-                xi, wi = zip(*items)
-                bg = pg.BarGraphItem(
-                    x=list(xi), width=list(wi), y0=[0.03] * len(xi), height=[0.05]*len(xi), 
-                    brush= '#FFCE1B', pen=None )                
-                bg.setZValue(-10)
-                bg.setAcceptedMouseButtons(QtCore.Qt.NoButton)
-                bg.setAcceptHoverEvents(False)
-                pi.addItem(bg)
-                self.updated_hypno.append(bg)
+            if has_staging:
+                df2 = df2[ ['E' , 'OSTAGE' ] ]
+            else:
+                df2 = pd.DataFrame({
+                    "E": df1["E"],
+                    "OSTAGE": "?"
+                })
+
+            # merge
+            df = pd.merge(df1, df2, on="E", how="inner")
+            m.set_masked( df[ 'START' ].to_numpy( float ) , df[ 'STOP' ].to_numpy( float ) , df[ 'OSTAGE' ] )
+
+        # clear if previously added
+        if getattr(self, "updated_hypno", None) is not None:
+            for it in self.updated_hypno:
+                pi.removeItem(it)
+            self.updated_hypno.clear()
+
+        # staging (0.10 - 0.15) + simple segment plot (0.03 - 0.08) as one image
+        img = pg.ImageItem( m.lane_image( self._stage_rgba() , ( 0xFF , 0xCE , 0x1B , 255 ) ) , autoDownsample=False )
+        img.setRect( QtCore.QRectF( 0 , 0.03 , m.width , 0.12 ) )
+        img.setZValue(-10)
+        img.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        img.setAcceptHoverEvents(False)
+        pi.addItem(img)
+        self.updated_hypno = [ img ]
+
+
+    def _hypno_model(self):
+        # original staging on first use; see _invalidate_hypno()
+        m = getattr(self, "hypno_model", None)
+        if m is None:
+            m = HypnoModel( self.ns )
+            with self._luna_lock:
+                stg_evts = self.p.fetch_annots( list( STAGES ) , 30 )
+            if len( stg_evts ) != 0:
+                m.set_original( stg_evts[ 'Start' ].to_numpy( float ) ,
+                                stg_evts[ 'Stop' ].to_numpy( float ) ,
+                                stg_evts[ 'Class' ] )
+            self.hypno_model = m
+        return m
+
+    def _invalidate_hypno(self):
+        # annotations or masks changed (or a new instance)
+        self.hypno_model = None
+
+    def _stage_rgba(self):
+        out = { }
+        for s in STAGES:
+            c = self.stgcols_hex.get( s )
+            if c is not None:
+                q = QtGui.QColor( c )
+                out[ s ] = ( q.red() , q.green() , q.blue() , q.alpha() )
+        return out
 
 
-        
     # --------------------------------------------------------------------------------
     #
     # click Render --> initiate segsrv_t for channel / annotation drawing 
     #
     # --------------------------------------------------------------------------------
     
-    def _populate_segsrv(self):
+    def _populate_segsrv(self, ss, chs, anns):
         # compute on separate thread
         # --> do not touch the GUI here
-        
+        # (the scheduler skips the group if the Render was cancelled)
+
         # pre-calculate any summary stats? [ignore for now]
         #ss.calc_bands( bsigs )
         #ss.calc_hjorths( hsigs )
-        throttle1_sr = 100 
-        self.ss.input_throttle( throttle1_sr )
-        throttle2_np = 5 * 30 * 100 
-        self.ss.throttle( throttle2_np )
-        summary_mins = 30 
-        self.ss.summary_threshold_mins( summary_mins )
-        # special version that releases the GIL
-        self.ss.segsrv.populate_lunascope( chs = self.ss_chs , anns = self.ss_anns )
-        self.ss.set_annot_format6( False ) # pyqtgraph, not plotly
-        self.ss.set_clip_xaxes( False )
-        
+        with self._luna_lock:
+            if ss is None:
+                ss = lp.segsrv( self.p )
+            throttle1_sr = 100 
+            ss.input_throttle( throttle1_sr )
+            throttle2_np = 5 * 30 * 100 
+            ss.throttle( throttle2_np )
+            summary_mins = 30 
+            ss.summary_threshold_mins( summary_mins )
+            # special version that releases the GIL
+            ss.segsrv.populate_lunascope( chs = chs , anns = anns )
+        ss.set_annot_format6( False ) # pyqtgraph, not plotly
+        ss.set_clip_xaxes( False )
+        return ss
+
+
+    def _segsrv_jobs(self, chs):
+        # channel groups, populated one after the other: a small first
+        # group (w/ all annotations) so that something is seen quickly
+        first = 2
+        size = 4
+        groups = [ chs[:first] ]
+        groups += [ chs[i:i+size] for i in range( first , len(chs) , size ) ]
+        return groups
+
+    
     def _render_signals(self):
 
         if not hasattr(self, "p"):
@@ -421,10 +463,10 @@ class SignalsMixin:
         self._set_render_status( True , True)
 
         # ------------------------------------------------------------
-        # do rendering on a separate thread
-
-        # ------------------------------------------------------------
-        # execute command string 'cmd' in a separate thread
+        # do rendering on a separate thread, one channel group at a time:
+        # the first group (and all annotations) go to the primary segsrv,
+        # later groups to their own segsrv objects; each shows up in pg1
+        # as soon as it is ready
 
         # note that we're busy
         self._busy = True
@@ -432,58 +474,94 @@ class SignalsMixin:
         # and do not let other jobs be run
         self._buttons( False )
 
+        # drop any channels populated by a previous Render
+        self.ss.reset()
+        self._render_req += 1
+        req = self._render_req
+        groups = self._segsrv_jobs( self.ss_chs )
+        self._segsrv_todo = len( groups )
+        self._segsrv_first = True
+        tok = self._start_job()
+
         # start progress bar
         self.sb_progress.setVisible(True)
-        self.sb_progress.setRange(0, 0) 
-        self.sb_progress.setFormat("Running…")
+        self.sb_progress.setRange(0, self._segsrv_todo) 
+        self.sb_progress.setValue(0)
+        self.sb_progress.setFormat("Rendering %v/%m")
         self.lock_ui()
 
-        # set up call on different thread
-        fut_ss = self._exec.submit( self._populate_segsrv )  # returns nothing
-                
-        def done_segsrv( _f=fut_ss ):
-            try:
-                exc = _f.exception()
-                if exc is None:
-                    # self._last_result = _f.result()  # nothing returned
-                    QMetaObject.invokeMethod(self, "_segsrv_done_ok", Qt.QueuedConnection)
-                else:
-                    self._last_exc = exc
-                    self._last_tb = f"{type(exc).__name__}: {exc}"
-                    QMetaObject.invokeMethod(self, "_segsrv_done_err", Qt.QueuedConnection)
-            except Exception as cb_exc:
-                self._last_exc = cb_exc
-                self._last_tb = f"{type(cb_exc).__name__}: {cb_exc}"
-                QMetaObject.invokeMethod(self, "_segsrv_done_err", Qt.QueuedConnection)
-
-        # add the callback
-        fut_ss.add_done_callback( done_segsrv )
+        group = self.ss
+        for i, chs in enumerate( groups ):
 
+            # populate on the Luna worker, groups in order
+            ss = group.primary if i == 0 else None
+            anns = self.ss_anns if i == 0 else [ ]
+            self.jobs.submit( self._populate_segsrv , ss , chs , anns ,
+                              prio = INTERACTIVE , pool = 'luna' , tok = tok ,
+                              done = lambda job , _chs=chs : self._segsrv_done( job , req , group , _chs ) )
 
 
-    @Slot()
-    def _segsrv_done_ok(self):        
+    def _segsrv_done(self, job, req, group, chs):
+        # a finished channel group; ignored if no longer current
+        if req != self._render_req or group is not self.ss:
+            return
+        if job.cancelled or job.tok.cancelled:
+            self._segsrv_done_cancel()
+        elif job.error is not None:
+            self._last_exc = job.error
+            self._last_tb = job.tb
+            self._segsrv_done_err()
+        else:
+            self._segsrv_done_ok( job.result , chs )
+
+    def _segsrv_finish(self):
+        self.unlock_ui()
+        self._end_job()
+        self._busy = False
+        self._buttons( True )
+        self.sb_progress.setRange(0, 100); self.sb_progress.setValue(0)
+        self.sb_progress.setFormat("%p%")
+        self.sb_progress.setVisible(False)
+    
+    def _segsrv_done_ok(self, ss, chs):
+        self._segsrv_todo -= 1
         try:
-            self._complete_rendering()
+            self.ss.add( ss , chs )
+            self.sb_progress.setValue( self.sb_progress.value() + 1 )
+            if self._segsrv_first:
+                # first group: set up traces, release the UI
+                self._segsrv_first = False
+                self.unlock_ui()
+                self._complete_rendering()
+            else:
+                # later groups: rescale + redraw (new traces appear)
+                self._update_scaling()
         finally:
-            self.unlock_ui()
-            self._busy = False
-            self._buttons( True )           
-            self.sb_progress.setRange(0, 100); self.sb_progress.setValue(0)
-            self.sb_progress.setVisible(False)
+            if self._segsrv_todo == 0:
+                self._segsrv_finish()
             
-    @Slot()
     def _segsrv_done_err(self):
+        self._segsrv_todo -= 1
         try:
             # show or log the error; pick one
             from PySide6.QtWidgets import QMessageBox
             QMessageBox.critical(self.ui, "Error rendering sample", self._last_tb)
         finally:
-            self.unlock_ui()
-            self._busy = False
-            self._buttons( True )
-            self.sb_progress.setRange(0, 100); self.sb_progress.setValue(0)
-            self.sb_progress.setVisible(False)
+            if self._segsrv_first:
+                self._set_render_status( False , False )
+            if self._segsrv_todo == 0:
+                self._segsrv_finish()
+
+    def _segsrv_done_cancel(self):
+        # drop this Render: groups still queued are ignored (and skip
+        # their populate), segsrv objects built so far are released and
+        # the view falls back to the pre-Render (direct slice) mode
+        self._render_req += 1
+        self._segsrv_todo = 0
+        self.ss.reset()
+        self._set_render_status( False , False )
+        self._segsrv_finish()
+        self._request_pg1()
 
      
     def _complete_rendering(self):
@@ -513,24 +591,119 @@ class SignalsMixin:
         if lo < 0: lo = 0
         if hi > self.ns: hi = self.ns 
         if hi < lo: hi = lo
+
+        # applied at the next frame (replacing any window not yet drawn)
+        self._pending_win = ( lo , hi )
+        self._request_pg1()
+
+
+    def _apply_window(self, lo, hi):
         
         # update ss window
         t1 = ""
         t2 = ""        
         if self.rendered is True:
-            self.ss.window( lo  , hi )
+            with self.perf.stage( 'ss.window' ):
+                self.ss.window( lo  , hi )
             t1 = self.ss.get_window_left_hms()
             t2 = self.ss.get_window_right_hms()
         else: # annot only segsrv
-            self.ssa.window( lo  , hi )
+            with self.perf.stage( 'ss.window' ):
+                self.ssa.window( lo  , hi )
             t1 = self.ssa.get_window_left_hms()
             t2 = self.ssa.get_window_right_hms()
 
         self.ui.lbl_twin.setText( f"T: {t1} - {t2}" )
+        self._spec_follow( lo , hi )
         lo = int(lo/30)+1
         hi = int(hi/30)+1
         self.ui.lbl_ewin.setText( f"E: {lo} - {hi}" )
-        self._update_pg1()
+
+
+    # --------------------------------------------------------------------------------
+    #
+    # frame scheduler: mark pg1 dirty, redraw at most once per frame
+    #
+    # --------------------------------------------------------------------------------
+
+    def _request_pg1(self):
+
+        # already scheduled: this request is folded into that frame
+        if self._frame_timer.isActive():
+            self.frames_skipped += 1
+            return
+
+        # otherwise, draw as soon as a frame interval has passed
+        wait = self._frame_ms - 1000.0 * ( time.perf_counter() - self._frame_last )
+        self._frame_timer.start( max( 0 , int( wait ) ) )
+
+    def _frame(self):
+
+        self._frame_last = time.perf_counter()
+
+        # nothing to draw on
+        if not hasattr(self, "p"):
+            self._pending_win = None
+            return
+
+        # latest requested window
+        if self._pending_win is not None:
+            lo, hi = self._pending_win
+            self._pending_win = None
+            self._apply_window( lo , hi )
+
+        with self.perf.stage( 'frame' ):
+            self._update_pg1()
+        self.frames_drawn += 1
+        self.perf.count( 'frames.skipped' , self.frames_skipped - self.perf_skipped )
+        self.perf_skipped = self.frames_skipped
+        self.perf.end_frame()
+        self._update_perf_hud()
+
+
+    # --------------------------------------------------------------------------------
+    #
+    # performance HUD (stage timings on pg1) and CSV export
+    #
+    # --------------------------------------------------------------------------------
+
+    def _toggle_perf(self, on):
+        self.perf.enabled = bool( on )
+        self.perf.reset()
+        self.perf_skipped = self.frames_skipped
+        # (no traces until a record is drawn: they pick this up then)
+        if hasattr(self, "traces"):
+            self.traces.perf = self.perf if on else None
+        self.perf_hud.setVisible( bool( on ) )
+        if on:
+            self.perf_hud.setText( "(waiting for next frame)" )
+            self.perf_hud.adjustSize()
+            self.perf_hud.raise_()
+
+    def _update_perf_hud(self):
+        if not self.perf_hud.isVisible():
+            return
+        # at most ~4 updates / sec
+        now = time.perf_counter()
+        if now - self._perf_hud_t < 0.25:
+            return
+        self._perf_hud_t = now
+        self.perf_hud.setText( self.perf.text() )
+        self.perf_hud.adjustSize()
+
+    def _export_perf(self):
+        if not self.perf.summary():
+            QMessageBox.information( self.ui , "Export timings" , "No timings recorded: show the performance HUD and page through a record first" )
+            return
+        fn, _ = QFileDialog.getSaveFileName( self.ui , "Export timings" , "lunascope-timings.csv" ,
+                                             "CSV Files (*.csv);;All Files (*)" ,
+                                             options=QFileDialog.Option.DontUseNativeDialog )
+        if not fn:
+            return
+        try:
+            self.perf.to_csv( fn )
+        except OSError as e:
+            QMessageBox.critical( self.ui , "Export timings" , f"Could not write {fn}\n{type(e).__name__}: {e}" )
 
 
 
@@ -558,9 +731,9 @@ class SignalsMixin:
         self._initiate_curves()
 
         # ready view
+        self._pending_win = None
         self.ssa.window(0,30)        
         self._update_scaling()
-        self._update_pg1_simple()
         
 
 
@@ -599,9 +772,6 @@ class SignalsMixin:
         pi = self.ui.pg1.getPlotItem()
         pi.clear() 
 
-        for curve in self.curves:
-            pi.removeItem(curve)
-
         self.curves.clear()
 
         for curve in self.annot_curves:
@@ -613,11 +783,12 @@ class SignalsMixin:
         # initiate channels
         #
         
-        for i in range(nchan):
-            pen = pg.mkPen( self.colors[i], width=1, cosmetic=True)
-            c = pg.PlotCurveItem(pen=pen, connect='finite')
-            pi.addItem(c)
-            self.curves.append(c)
+        # (one item draws all channels; self.curves holds its row handles)
+        pens = [ pg.mkPen( self.colors[i], width=1, cosmetic=True) for i in range(nchan) ]
+        self.traces = MultiTraceItem( pens )
+        self.traces.perf = self.perf if self.perf.enabled else None
+        pi.addItem( self.traces )
+        self.curves.extend( self.traces.rows() )
 
         #
         # initiate annotations
@@ -684,7 +855,7 @@ class SignalsMixin:
             self.show_labels = False
             
         # redraw
-        self._update_pg1()
+        self._request_pg1()
 
     # --------------------------------------------------------------------------------
     #
@@ -761,7 +932,10 @@ class SignalsMixin:
 
         # update main plot (passes to _update_pg1_simple() as needed)
             
-        self._update_pg1()
+        self._request_pg1()
+
+        # checked annotations may have changed
+        self._update_nav_density()
 
 
 
@@ -777,8 +951,6 @@ class SignalsMixin:
         pi = self.ui.pg1.getPlotItem()
         pi.clear() 
 
-        for curve in self.curves:
-            pi.removeItem(curve)
         self.curves.clear()
 
         for curve in self.annot_curves:
@@ -833,20 +1005,31 @@ class SignalsMixin:
             anns = sorted( anns, key=lambda x: (self.cmap_list.index(x) if x in self.cmap_list else len(self.cmap_list) + anns.index(x)))
         
         # channels
+        pf = self.perf
         nchan = len( chs )
         idx = 0        
         tv = [ '' ] * ( len(chs) + len(anns) )
         yv = [ 0.5 ] * ( len(chs) + len(anns) )
         xv = [  x1 + ( x2 - x1 ) * 0.02 ] * ( len(chs) + len(anns) )
         for ch in chs:
+            # not yet populated (progressive Render)?
+            if not self.ss.has( ch ):
+                self.curves[nchan-idx-1].setData([], [])
+                yv[idx] = self.ss.get_ylabel( idx )
+                idx = idx + 1
+                continue
             # signals
-            x = self.ss.get_timetrack( ch )
-            y = self.ss.get_scaled_signal( ch , idx )
+            with pf.stage( 'get_scaled_signal' ):
+                x = self.ss.get_timetrack( ch )
+                y = self.ss.get_scaled_signal( ch , idx )
             # note: if filters set, these will have been passed to segsrv, which will
             #       take care of filtering in the above call
 
             # draw
-            self.curves[nchan-idx-1].setData(x, y)            
+            with pf.stage( 'curves.setData' ):
+                self.curves[nchan-idx-1].setData(x, y)            
+            pf.count( 'points' , len(y) )
+            pf.count( 'items' )
             # labels            
             ylim = self.ss.get_window_phys_range( ch )
             if self.show_labels:
@@ -856,28 +1039,7 @@ class SignalsMixin:
             idx = idx + 1
         
         # annots
-        aidx = 0
-        self.ss.compile_windowed_annots( anns )
-        for ann in anns:
-            a0 = self.ss.get_annots_xaxes( ann )            
-            if len(a0) == 0:
-                idx = idx + 1
-                aidx = aidx + 1
-                continue
-            a1 = self.ss.get_annots_xaxes_ends( ann )            
-            y0 = self.ss.get_annots_yaxes( ann )
-            y1 = self.ss.get_annots_yaxes_ends( ann )
-            self.annot_curves[aidx].setData( [ x1 , x2 ] , [ ( y0[0] + y1[0] ) / 2  , ( y0[0] + y1[0] ) / 2 ] )
-#            self.annot_mgr.toggle( ann , True )
-            a0, a1 = _ensure_min_px_width( vb, a0, a1, px=1)  # 1-px minimum
-            self.annot_mgr.update_track( ann , x0 = a0 , x1 = a1 , y0 = y0 , y1 = y1 , reduce = True )
-            # labels
-            yv[idx] = ( y0[0] * 2 + y1[0]  ) / 3.0
-            if self.show_labels: 
-                if ann and str(ann).strip():
-                    tv[idx] = ann
-            idx = idx + 1
-            aidx = aidx + 1
+        idx = self._draw_annots( anns , x1 , x2 , idx , yv , tv )
 
         xv2, yv2, tv2 = [], [], []
         for x, y, t in zip(xv, yv, tv):
@@ -886,7 +1048,8 @@ class SignalsMixin:
                 yv2.append(y)
                 tv2.append(t)
 
-        self.labs.setData(xv2, yv2, tv2)
+        with pf.stage( 'TextBatch.setData' ):
+            self.labs.setData(xv2, yv2, tv2)
 
         # gaps (list of (start,stop) values
         gaps = self.ss.get_gaps()
@@ -894,7 +1057,8 @@ class SignalsMixin:
         x1 =  [ x[1] for x in gaps ]
         y0 =  [ 0.01 for x in gaps ]
         y1 =  [ 0.96 for x in gaps ]
-        gaps = self.annot_mgr.update_track( "__#gaps__" ,x0 = x0 , x1 = x1 , y0 = y0 , y1 = y1 )
+        with pf.stage( 'update_track' ):
+            gaps = self.annot_mgr.update_track( "__#gaps__" ,x0 = x0 , x1 = x1 , y0 = y0 , y1 = y1 )
             
         # clock-ticks                                                                                                          
         x1 = self.ss.get_window_left()
@@ -906,7 +1070,8 @@ class SignalsMixin:
         tv.append( self._durstr( x1 , x2 ) )
         tx.append( x2 - 0.05 * ( x2 - x1 ) )
         ty.append( 0.03 )
-        self.tb.setData(tx, ty , tv )
+        with pf.stage( 'TextBatch.setData' ):
+            self.tb.setData(tx, ty , tv )
 
         # repaint
         vb.update()  
@@ -923,7 +1088,7 @@ class SignalsMixin:
     # --------------------------------------------------------------------------------
     #
     # simple (non-segsrv) update main signal traces - called if segsrv not populated
-    # restrict to single epoch plotting here
+    # signals are min/max decimated to the pixel width of the view
     # --------------------------------------------------------------------------------
 
     def _update_pg1_simple(self):
@@ -945,21 +1110,14 @@ class SignalsMixin:
         x1 = self.ssa.get_window_left()
         x2 = self.ssa.get_window_right()
 
-        # if 1+ signals, do not allow large windows
-        if len(chs) != 0 and x2 - x1 > 30:
-            # will be 38
-            self.sel.setRange(x1+4, x1+30+4)
-            return
-        
-        # store for any updates
-        self.last_x1 = x1
-        self.last_x2 = x2
-
         # get canvas
         pw = self.ui.pg1
         vb = pw.getPlotItem().getViewBox()
         vb.setRange(xRange=(x1,x2), padding=0, update=False)  # no immediate paint
 
+        # ~2 points per screen pixel (min/max per pixel column)
+        npix = view_pixels( vb )
+
         # scaling
         h = 1 - self.pg1_header_height - self.pg1_footer_height - self.pg1_annot_height
         if len(chs) != 0:
@@ -973,75 +1131,90 @@ class SignalsMixin:
             anns = sorted( anns, key=lambda x: (self.cmap_list.index(x) if x in self.cmap_list else len(self.cmap_list) + anns.index(x)))
             chs.reverse()
             
-        # channels
+        # paging direction (for read-ahead)
+        step = x1 - self.last_x1 if ( x2 - x1 ) == ( self.last_x2 - self.last_x1 ) else 0
+
+        # signals: wide window, use a precomputed envelope if one is fine
+        # enough (only for unfiltered signals); otherwise the window slices
+        # (time-track, unscaled/filtered signal) for all channels at once
+        envs = { }
+        for ch in chs:
+            pyr = self.pyramids.get( ch ) if ch not in self.fmap else None
+            env = pyr.window( x1 , x2 , npix ) if pyr is not None else None
+            if env is not None:
+                envs[ ch ] = env
+        raw_chs = [ ch for ch in chs if ch not in envs ]
+        pf = self.perf
+        with pf.stage( 'fetch' ):
+            wins = self._fetch_windows( self.p , self._sig_gen , raw_chs , x1 , x2 )
+
+        # reduce to what can be seen and scale to 0/1: one group of
+        # equal-length windows (same SR) at a time
+        traces = { }
+        stacks = [ ]
+        for ch, ( t , lo , hi ) in envs.items():
+            x, y = envelope_to_xy( t , lo , hi )
+            mn, mx = np.array( [ np.min(lo) ] ) , np.array( [ np.max(hi) ] )
+            traces[ ch ] = ( mn , mx , 0 )
+            stacks.append( ( x , scale01( y[None,:] , mn , mx ) , [ ch ] ) )
+        groups = defaultdict( list )
+        for ch in raw_chs:
+            # no data, e.g. in gap?
+            if len( wins[ ch ][1] ) != 0:
+                groups[ ( self.srs[ ch ] , len( wins[ ch ][1] ) ) ].append( ch )
+        for grp in groups.values():
+            with pf.stage( 'decimate' ):
+                x = wins[ grp[0] ][0]
+                ys = np.vstack( [ wins[ ch ][1] for ch in grp ] )
+                mn, mx = ys.min( axis = 1 ) , ys.max( axis = 1 )
+                x, ys = minmax_decimate( x , ys , npix )
+                # need to scale manually: to 0/1
+                ys = scale01( ys , mn , mx )
+            for j, ch in enumerate( grp ):
+                traces[ ch ] = ( mn , mx , j )
+            stacks.append( ( x , ys , grp ) )
+
+        # channels: each group's stacked rows --> to grid values, pushed
+        # to the trace item in one call
+        row = { ch : i for i, ch in enumerate( chs ) }
+        for x, ys, grp in stacks:
+            rows = [ row[ ch ] for ch in grp ]
+            ybase = np.array( rows , dtype=float ) * h + self.pg1_footer_height
+            with pf.stage( 'curves.setData' ):
+                self.traces.setData( x , ybase[:,None] + ys * h , rows = rows )
+            pf.count( 'points' , ys.size )
+            pf.count( 'items' , len( grp ) )
+
         idx = 0        
         tv = [ '' ] * ( len(chs) + len(anns) )
         yv = [ 0.5 ] * ( len(chs) + len(anns) )
         xv = [ x1 + ( x2 - x1 ) * 0.02 ] * ( len(chs) + len(anns) )
         for ch in chs:
-            # signals
-            d = self.p.slice( self.p.s2i( [ ( x1 , x2 ) ] ) , chs = ch , time = True )[1]
-            # no data, e.g. in gap?
-            if len(d) == 0:
+            if ch not in traces:
                 idx = idx + 1
                 continue
-            x = d[:,0]  # time-track
-            y = d[:,1]  # unscaled signal
-            # filter?
-            if ch in self.fmap:
-                y = self.filter_signal( y , ( self.fmap[ch] , self.srs[ ch ] ) )
-            # need to scale manually: to 0/1
-            mn, mx = min(y), max(y)
-            if mx > mn: y = (y - mn) / (mx - mn)
-            else: y = y - y
-            # --> to grid value
+            mn, mx, j = traces[ ch ]
             ybase = idx * h + self.pg1_footer_height
-            y = ybase + y * h 
-            # plot
-            self.curves[idx].setData(x, y)
             # labels
-            ylim = [ mn , mx ] 
+            ylim = [ float(mn[j]) , float(mx[j]) ] 
             if self.show_labels:
                 tv[idx] = ' ' + ch + ' ' + str(round(ylim[0],3)) + ':' + str(round(ylim[1],3)) + ' (' + self.units[ ch ] +')'
             yv[idx] = ybase + 0.5 * h
             # next
             idx = idx + 1
 
-        # annots (from ssa)
-        aidx = 0
-        self.ssa.compile_windowed_annots( anns )
-        
-        for ann in anns:
+        # read ahead in the direction of travel
+        self._prefetch_windows( raw_chs , x1 , x2 , step )
 
-            # get events
-            a0 = self.ssa.get_annots_xaxes( ann )            
+        # whole-record filtering of any band-filtered channels
+        self._request_filtered( [ ch for ch in chs if ch in self.fmap ] )
 
-            # nothing to do?
-            if len(a0) == 0:
-                self.annot_curves[ aidx ].setData( [ ] , [ ] )
-                idx = idx + 1
-                aidx = aidx + 1                
-                continue
-
-            # pull
-            a1 = self.ssa.get_annots_xaxes_ends( ann )
-            y0 = self.ssa.get_annots_yaxes( ann )
-            y1 = self.ssa.get_annots_yaxes_ends( ann )
-           
-            # draw
-            self.annot_curves[ aidx ].setData( [ x1 , x2 ] , [ ( y0[0] + y1[0] ) / 2  , ( y0[0] + y1[0] ) / 2 ] ) 
-
-            #            self.annot_mgr.toggle( ann , True )
-            a0, a1 = _ensure_min_px_width( vb, a0, a1, px=1)  # 1-px minimum
-            self.annot_mgr.update_track( ann , x0 = a0 , x1 = a1 , y0 = y0 , y1 = y1 , reduce = True )
-
-            # labels
-            yv[idx] = ( y0[0] * 2 + y1[0]  ) / 3.0 
-            if self.show_labels: tv[idx] = ann
+        # store for any updates
+        self.last_x1 = x1
+        self.last_x2 = x2
 
-            # next annot
-            idx = idx + 1
-            aidx = aidx + 1
+        # annots
+        idx = self._draw_annots( anns , x1 , x2 , idx , yv , tv )
 
             
         # add labels
@@ -1053,7 +1226,8 @@ class SignalsMixin:
                 yv2.append(y)
                 tv2.append(t)
 
-        self.labs.setData(xv2, yv2, tv2)
+        with pf.stage( 'TextBatch.setData' ):
+            self.labs.setData(xv2, yv2, tv2)
 
         # gaps (list of (start,stop) values
         gaps = self.ssa.get_gaps()
@@ -1061,7 +1235,8 @@ class SignalsMixin:
         x1 =  [ x[1] for x in gaps ]
         y0 =  [ 0.01 for x in gaps ]
         y1 =  [ 0.96 for x in gaps ]
-        gaps = self.annot_mgr.update_track( "__#gaps__" ,x0 = x0 , x1 = x1 , y0 = y0 , y1 = y1 )
+        with pf.stage( 'update_track' ):
+            gaps = self.annot_mgr.update_track( "__#gaps__" ,x0 = x0 , x1 = x1 , y0 = y0 , y1 = y1 )
             
         # clock-ticks
         x1 = self.ssa.get_window_left()
@@ -1073,31 +1248,434 @@ class SignalsMixin:
         tv.append( self._durstr( x1 , x2 ) )
         tx.append( x2 - 0.05 * ( x2 - x1 ) )
         ty.append( 0.03 )
-        self.tb.setData(tx, ty , tv )
+        with pf.stage( 'TextBatch.setData' ):
+            self.tb.setData(tx, ty , tv )
 
         # repaint
         vb.update()  
         
 
 
-# ------------------------------------------------------------
-
-    def filter_signal( self , x , fs_key , order = 2):
+    # --------------------------------------------------------------------------------
+    #
+    # annotation tracks (both views): windowed from the annotation index,
+    # one row per checked class, stacked down from below the header
+    #
+    # --------------------------------------------------------------------------------
 
-        if fs_key in self.fmap_flts:
-            return sosfilt( self.fmap_flts[ fs_key ] , x )
+    def _annot_rows(self, n):
+        # ( y0 , y1 ) of each of n annotation rows, top row first
+        if n == 0:
+            return [ ]
+        if len( self.ui.tbl_desc_signals.checked() ) != 0:
+            band = self.pg1_annot_height
         else:
+            band = 1 - self.pg1_footer_height - self.pg1_header_height
+        top = 1 - self.pg1_header_height
+        rh = band / n
+        return [ ( top - ( i + 0.9 ) * rh , top - ( i + 0.1 ) * rh ) for i in range( n ) ]
+
+    def _draw_annots(self, anns, x1, x2, idx, yv, tv):
+        pf = self.perf
+        rows = self._annot_rows( len( anns ) )
+        npix = view_pixels( self.ui.pg1.getPlotItem().getViewBox() )
+        for aidx, ann in enumerate( anns ):
+            # get events
+            with pf.stage( 'annot_index' ):
+                a0, a1 = self.annot_idx.window( ann , x1 , x2 )
+            r0, r1 = rows[ aidx ]
+            # draw (baseline only if any events in view)
+            ym = ( r0 + r1 ) / 2
+            if len( a0 ) != 0:
+                self.annot_curves[ aidx ].setData( [ x1 , x2 ] , [ ym , ym ] )
+            else:
+                self.annot_curves[ aidx ].setData( [ ] , [ ] )
+            with pf.stage( 'update_track' ):
+                if len( a0 ) > self.annot_lod * npix:
+                    # dense: one bar per pixel column, height ~ # events
+                    e, c = event_density( a0 , a1 , x1 , x2 , npix )
+                    k = np.flatnonzero( c )
+                    y1 = r0 + ( r1 - r0 ) * ( 0.25 + 0.75 * c[k] / c.max() )
+                    self.annot_mgr.update_track( ann , x0 = e[k] , x1 = e[k+1] ,
+                                                 y0 = np.full( len( k ) , r0 ) , y1 = y1 )
+                else:
+                    # (1-px minimum width enforced when drawn)
+                    self.annot_mgr.update_track( ann , x0 = a0 , x1 = a1 ,
+                                                 y0 = np.full( len( a0 ) , r0 ) ,
+                                                 y1 = np.full( len( a0 ) , r1 ) ,
+                                                 reduce = True )
+            pf.count( 'items' )
+            # labels
+            if len( a0 ) != 0:
+                yv[idx] = ( r0 * 2 + r1 ) / 3.0
+                if self.show_labels and ann and str(ann).strip():
+                    tv[idx] = ann
+            # next annot
+            idx = idx + 1
+        return idx
+
+
+    # --------------------------------------------------------------------------------
+    #
+    # navigator: whole-record event density of checked annotations, one lane
+    # each, between the masked staging and the hypnogram
+    #
+    # --------------------------------------------------------------------------------
+
+    def _toggle_nav_density(self, on):
+        self.nav_density = bool( on )
+        self._update_nav_density()
+
+    def _update_nav_density(self):
+
+        pi = self.ui.pgh.getPlotItem()
+        for it in self.nav_lanes:
+            pi.removeItem( it )
+        self.nav_lanes = [ ]
+
+        if not self.nav_density or not hasattr(self, "p"):
+            return
+
+        anns = self.ui.tbl_desc_annots.checked()
+        if len( anns ) == 0:
+            return
+
+        ncols = view_pixels( pi.getViewBox() )
+        lo, hi = 0.16, 0.245
+        lh = ( hi - lo ) / len( anns )
+        for i, ann in enumerate( anns ):
+            a0 = self.annot_idx.window( ann , 0 , self.ns )
+            e, c = event_density( a0[0] , a0[1] , 0 , self.ns , ncols )
+            k = np.flatnonzero( c )
+            if len( k ) == 0:
+                continue
+            y0 = hi - ( i + 1 ) * lh
+            y1 = y0 + lh * ( 0.2 + 0.8 * c[k] / c.max() )
+            t = self.annot_mgr.tracks.get( ann ) if hasattr(self, "annot_mgr") else None
+            lane = RectBatchItem( brush = t["color"] if t else ( 200 , 250 , 240 ) , pen = None )
+            lane.setRects( e[k] , e[k+1] , np.full( len( k ) , y0 ) , y1 )
+            lane.setZValue( -5 )
+            lane.setAcceptedMouseButtons( QtCore.Qt.NoButton )
+            pi.addItem( lane )
+            self.nav_lanes.append( lane )
+
+
+    # --------------------------------------------------------------------------------
+    #
+    # attached record / its signals changed: drop all derived data
+    #
+    # --------------------------------------------------------------------------------
+
+    def _signals_changed(self):
+        self._sig_gen += 1
+        self._cancel_background()
+        self.win_cache.clear()
+        self.flt_cache.clear()
+        self.flt_nocache.clear()
+        self._build_pyramids()
+
+    def _cancel_background(self):
+        # stop all slicing of the record as is (pyramids, whole-record
+        # filters, read-ahead), e.g. before a command that may change it
+        self._bg_tok.cancel()
+        self._bg_tok = CancelToken()
+        self._prefetch_tok.cancel()
+        self._prefetch_tok = CancelToken()
+
+
+    # --------------------------------------------------------------------------------
+    #
+    # window slices (pre-Render view), with read-ahead while paging
+    #
+    # --------------------------------------------------------------------------------
+
+    def _fetch_windows(self, p, gen, chs, x1, x2):
+        # may be called from the prefetch thread: do not touch the GUI
+        # returns { ch : ( x , y ) } (raw or display-filtered)
+
+        # cache keys: ( signal-state generation , channel , filter , window )
+        # where filter is None for the raw slice, else the fmap label
+        out = { }
+        raw = { }
+        raw_miss = [ ]
+        flt_miss = [ ]
+        for ch in chs:
+            fkey = self.fmap.get( ch )
+            if fkey is not None:
+                # whole-record filtered signal, if already done
+                f = self.flt_cache.get( ( gen , ch , fkey ) )
+                if f is not None:
+                    t, yf = f
+                    i0 = int( np.searchsorted( t , x1 , side='left' ) )
+                    i1 = int( np.searchsorted( t , x2 , side='right' ) )
+                    out[ ch ] = ( t[i0:i1], yf[i0:i1] )
+                    continue
+            d = self.win_cache.get( ( gen , ch , fkey , x1 , x2 ) )
+            if d is not None:
+                out[ ch ] = d
+                continue
+            if fkey is not None:
+                flt_miss.append( ch )
+                d = self.win_cache.get( ( gen , ch , None , x1 , x2 ) )
+                if d is not None:
+                    raw[ ch ] = d
+                    continue
+            raw_miss.append( ch )
+
+        # raw slices: one Luna call per sample rate
+        by_sr = defaultdict( list )
+        for ch in raw_miss:
+            by_sr[ self.srs[ ch ] ].append( ch )
+        for grp in by_sr.values():
+            with self._luna_lock:
+                d = p.slice( p.s2i( [ ( x1 , x2 ) ] ) , chs = grp , time = True )[1]
+            t = np.ascontiguousarray( d[:,0] ) if len(d) != 0 else np.empty(0)
+            for j, ch in enumerate( grp ):
+                r = ( t , np.ascontiguousarray( d[:,j+1] ) ) if len(d) != 0 else ( t , np.empty(0) )
+                raw[ ch ] = r
+                if gen == self._sig_gen:
+                    self.win_cache.put( ( gen , ch , None , x1 , x2 ) , r )
+            del d
+
+        for ch in raw_miss:
+            if ch not in flt_miss:
+                out[ ch ] = raw[ ch ]
+
+        # filtered slices (until the whole-record version is ready):
+        # one sosfilt per ( sample rate , band ) over the stacked windows
+        by_flt = defaultdict( list )
+        for ch in flt_miss:
+            by_flt[ ( self.srs[ ch ] , self.fmap[ ch ] , len( raw[ ch ][1] ) ) ].append( ch )
+        for ( sr , fkey , n ) , grp in by_flt.items():
+            sos = self._filter_sos( ( fkey , sr ) ) if n != 0 else None
+            ys = np.vstack( [ raw[ ch ][1] for ch in grp ] )
+            if sos is not None:
+                ys = sosfilt( sos , ys , axis = -1 )
+            for j, ch in enumerate( grp ):
+                r = ( raw[ ch ][0] , ys[j] )
+                out[ ch ] = r
+                if gen == self._sig_gen:
+                    self.win_cache.put( ( gen , ch , fkey , x1 , x2 ) , r )
+
+        return out
+
+
+    def _prefetch_windows(self, chs, x1, x2, step):
+
+        # supersede any read-ahead still queued
+        self._prefetch_tok.cancel()
+        self._prefetch_tok = CancelToken()
+
+        if len( chs ) == 0:
+            return
+
+        # N windows ahead in the paging direction, one behind
+        w = x2 - x1
+        s = step if step != 0 else w
+        wins = [ ( x1 + k * s , x2 + k * s ) for k in range( 1 , self._prefetch_n + 1 ) ]
+        wins.append( ( x1 - s , x2 - s ) )
+        wins = [ ( a , b ) for a , b in wins if a >= 0 and b <= self.ns ]
+
+        # one job per window, nearest first; behind any interactive work
+        # but ahead of queued analyses
+        gen = self._sig_gen
+        chs = tuple( chs )
+        for a, b in wins:
+            self.jobs.submit( self._prefetch_worker , self.p , gen , chs , a , b ,
+                              prio = PREFETCH , pool = 'luna' ,
+                              key = ( 'prefetch' , gen , chs , a , b ) ,
+                              tok = self._prefetch_tok )
+
+
+    def _prefetch_worker(self, p, gen, chs, a, b):
+        # worker thread: do not touch the GUI
+        if gen != self._sig_gen:
+            return
+        try:
+            self._fetch_windows( p , gen , list( chs ) , a , b )
+        except Exception as e:
+            # nothing half-done is left in the cache
+            for ch in chs:
+                self.win_cache.discard( ( gen , ch , None , a , b ) )
+                self.win_cache.discard( ( gen , ch , self.fmap.get( ch ) , a , b ) )
+            print( f"[Error] read-ahead of {a}-{b}s: {type(e).__name__}: {e}" , file=sys.stderr )
+
+
+    # --------------------------------------------------------------------------------
+    #
+    # background min/max pyramids, so that wide pre-Render windows are an
+    # O(pixels) lookup rather than a slice of every raw sample
+    #
+    # --------------------------------------------------------------------------------
+
+    def _build_pyramids(self, reset = True):
+
+        # anything built for a previous instance / state is dropped (or,
+        # if not reset, only channels not yet done are queued again)
+        if reset:
+            self.pyramids = { }
+
+        if not hasattr(self, "p"):
+            return
+
+        # currently selected channels first
+        with self._luna_lock:
+            chs = self.p.edf.channels()
+        sel = [ c for c in self.ui.tbl_desc_signals.checked() if c in chs ]
+        chs = sel + [ c for c in chs if c not in sel ]
+
+        # one idle-priority job per channel, so other work can get in
+        # between channels
+        for ch in chs:
+            if ch in self.pyramids:
+                continue
+            self.jobs.submit( self._pyramid_worker , self.p , self._sig_gen , ch , self.ns , self._bg_tok ,
+                              prio = IDLE , pool = 'numpy' ,
+                              key = ( 'pyramid' , self._sig_gen , ch ) , tok = self._bg_tok ,
+                              done = self._pyramid_ready )
+
+
+    def _pyramid_worker(self, p, gen, ch, ns, tok):
+        # worker thread: do not touch the GUI (stored by _pyramid_ready)
+        try:
+            d = self._slice_record( p , ch , ns , tok )
+        except Exception:
+            return
+        if d is None:
+            return
+        pyr = MinMaxPyramid( d[0] , d[1] )
+        del d
+        if not tok.cancelled:
+            return ( gen , ch , pyr )
+
+    def _pyramid_ready(self, job):
+        # GUI thread: keep only pyramids of the current signal generation
+        if not job.result:
+            return
+        gen, ch, pyr = job.result
+        if gen == self._sig_gen:
+            self.pyramids[ ch ] = pyr
+
+    def _slice_record(self, p, ch, ns, tok, span = 1800):
+        # worker thread: whole-record ( t , y ) of one channel, or None if
+        # empty or cancelled; sliced in spans of `span` seconds, taking the
+        # Luna lock for one span at a time, so that window fetches on the
+        # GUI thread wait for at most one span
+        ts, ys = [ ], [ ]
+        for a in range( 0 , int( np.ceil( ns ) ) , span ):
+            if tok.cancelled:
+                return None
+            with self._luna_lock:
+                d = p.slice( p.s2i( [ ( a , min( a + span , ns ) ) ] ) , chs = ch , time = True )[1]
+            if len(d) == 0:
+                continue
+            # adjacent spans may share a boundary sample
+            if ts:
+                d = d[ d[:,0] > ts[-1][-1] ]
+                if len(d) == 0:
+                    continue
+            ts.append( np.ascontiguousarray( d[:,0] ) )
+            ys.append( np.ascontiguousarray( d[:,1] ) )
+            del d
+        if len( ts ) == 0:
+            return None
+        return np.concatenate( ts ) , np.concatenate( ys )
+
+        
+    # --------------------------------------------------------------------------------
+    #
+    # display filters over the whole record (background, chunked), so that
+    # paging does not re-filter each window (w/ edge transients at its start)
+    #
+    # --------------------------------------------------------------------------------
+
+    def _request_filtered(self, chs):
+
+        if not hasattr(self, "p"):
+            return
+
+        gen = self._sig_gen
+        for ch in chs:
+            fkey = self.fmap[ ch ]
+            key = ( gen , ch , fkey )
+            if key in self.flt_cache or key in self.flt_nocache:
+                continue
+            sos = self._filter_sos( ( fkey , self.srs[ ch ] ) )
+            if sos is None:
+                continue
+            # feeds the current view: ahead of analyses (a request while
+            # one is pending is dropped by the scheduler)
+            self.jobs.submit( self._filter_worker , self.p , key , sos , self.ns , self._bg_tok ,
+                              prio = PREFETCH , pool = 'numpy' ,
+                              key = ( 'filter' , ) + key , tok = self._bg_tok ,
+                              done = self._filtered_ready )
+
+
+    def _filter_worker(self, p, key, sos, ns, tok, chunk = 2**20):
+        # worker thread: do not touch the GUI
+        gen, ch, fkey = key
+        if tok.cancelled:
+            return
+        d = self._slice_record( p , ch , ns , tok )
+        if d is None:
+            return
+        t, y = d
+        del d
+
+        # would not fit in the cache at all: not worth filtering here
+        if t.nbytes + y.size * 4 > self.flt_cache.max_bytes:
+            return ( key , False )
+
+        # filter in chunks, carrying the filter state across them; the
+        # initial state is set for a step at the first sample
+        out = np.empty( y.size , dtype=np.float32 )
+        zi = sosfilt_zi( sos ) * y[0]
+        for i in range( 0 , y.size , chunk ):
+            if tok.cancelled:
+                # drop the partial output (nothing was cached)
+                return
+            out[i:i+chunk], zi = sosfilt( sos , y[i:i+chunk] , zi = zi )
+        del y
+
+        if not tok.cancelled:
+            return ( key , self.flt_cache.put( key , ( t , out ) ) )
+
+    def _filtered_ready(self, job):
+        # ( key , stored ), or None if cancelled / no data
+        if not job.result:
+            return
+        key, stored = job.result
+        if not stored or key not in self.flt_cache:
+            # not kept (or already evicted): do not resubmit it
+            if key[0] == self._sig_gen:
+                self.flt_nocache.add( key )
+            return
+        # redraw the pre-Render view w/ whole-record filtered data
+        if hasattr(self, "p") and not self.rendered:
+            self._request_pg1()
+
+        
+# ------------------------------------------------------------
+
+    def _filter_sos( self , fs_key , order = 2):
+        # band-pass for ( fmap label , SR ), or None if above Nyquist
+        if fs_key not in self.fmap_flts:
             frqs = self.fmap_frqs[ fs_key[0] ]
             sr = fs_key[1]
             # ensure below Nyquist 
-            if frqs[1] <= sr / 2:
-                sos = butter( order,
-                              frqs , 
-                              btype='band',
-                              fs=sr , 
-                              output='sos' )
-                self.fmap_flts[ fs_key ] = sos
-                return sosfilt( sos , x )
+            if frqs[1] > sr / 2:
+                return None
+            self.fmap_flts[ fs_key ] = butter( order,
+                                               frqs , 
+                                               btype='band',
+                                               fs=sr , 
+                                               output='sos' )
+        return self.fmap_flts[ fs_key ]
+
+    def filter_signal( self , x , fs_key , order = 2):
+        sos = self._filter_sos( fs_key , order )
+        if sos is not None:
+            return sosfilt( sos , x )
         
 # ------------------------------------------------------------
 
@@ -1577,6 +2155,201 @@ class XRangeSelector(QtCore.QObject):
             self._schedule_emit(lo, hi)
 
 
+# --------------------------------------------------------------------------------
+#
+# several segsrv objects, populated one channel group at a time, seen as one
+#
+# --------------------------------------------------------------------------------
+
+class SegsrvGroup:
+    """
+    Wraps the primary segsrv (annotations + first channel group) and any
+    further segsrv objects holding later channel groups.  Per-channel calls
+    go to the segsrv that holds the channel, window/scaling/format calls are
+    applied to all (and replayed on groups added later), anything else goes
+    to the primary.
+    """
+
+    _per_channel = { 'get_timetrack', 'get_scaled_signal', 'get_window_phys_range',
+                     'empirical_physical_scale', 'fix_physical_scale', 'free_physical_scale' }
+
+    _broadcast = ( 'set_annot_format6', 'set_clip_xaxes', 'set_scaling', 'window' )
+
+    def __init__(self, primary):
+        self.primary = primary
+        self.parts = [ primary ]
+        self.owner = { }       # channel -> segsrv
+        self._filters = { }    # channel -> sos
+        self._calls = { }      # last args of each broadcast call
+
+    def reset(self):
+        self.parts = [ self.primary ]
+        self.owner = { }
+
+    def add(self, ss, chs):
+        if ss is not self.primary:
+            for name in self._broadcast:
+                if name in self._calls:
+                    getattr( ss , name )( *self._calls[ name ] )
+            self.parts.append( ss )
+        for ch in chs:
+            self.owner[ ch ] = ss
+            if ch in self._filters:
+                ss.apply_filter( ch , self._filters[ ch ] )
+
+    def has(self, ch):
+        return ch in self.owner
+
+    def apply_filter(self, ch, sos):
+        self._filters[ ch ] = sos
+        return self.owner.get( ch , self.primary ).apply_filter( ch , sos )
+
+    def clear_filter(self, ch):
+        self._filters.pop( ch , None )
+        return self.owner.get( ch , self.primary ).clear_filter( ch )
+
+    def __getattr__(self, name):
+        if name in self._per_channel:
+            def _dispatch(ch, *args):
+                return getattr( self.owner.get( ch , self.primary ) , name )( ch , *args )
+            return _dispatch
+        if name in self._broadcast:
+            def _all(*args):
+                self._calls[ name ] = args
+                res = None
+                for ss in self.parts:
+                    r = getattr( ss , name )( *args )
+                    if ss is self.primary: res = r
+                return res
+            return _all
+        return getattr( self.primary , name )
+
+
+# --------------------------------------------------------------------------------
+#
+# all signal traces in one graphics item
+#
+# --------------------------------------------------------------------------------
+
+class MultiTraceItem(pg.GraphicsObject):
+    """
+    Draws many traces (one per row, each w/ its own pen) in a single
+    paint call.  Data can be set for many rows from a stacked (rows x points)
+    array, or row by row via row(i), which returns a handle with the
+    setData / setPen calls of a PlotCurveItem.  Each row's bounds are kept
+    when its data is set, so the item's bounding rect is an O(rows)
+    reduction, signalled as changed once until it is next read.
+    """
+
+    def __init__(self, pens=()):
+        super().__init__()
+        self._x = [ ]
+        self._y = [ ]
+        self._paths = [ ]
+        self._pens = [ ]
+        self._bounds = [ ]
+        self._bbox = None
+        self._geom = False
+        self.perf = None    # optional PerfStats: times paint()
+        self.setRows( pens )
+
+    def setRows(self, pens):
+        n = len( pens )
+        self._x = [ None ] * n
+        self._y = [ None ] * n
+        self._paths = [ None ] * n
+        self._bounds = [ None ] * n
+        self._pens = [ pg.mkPen( pen ) for pen in pens ]
+        self._changed()
+
+    def rows(self):
+        return [ _TraceRow( self , i ) for i in range( len( self._pens ) ) ]
+
+    def setData(self, x, y, rows=None):
+        # stacked: y is lines x points; x is shared (1-D) or per line (2-D);
+        # line j goes to row rows[j] (default: rows 0, 1, ...)
+        x = np.asarray( x )
+        y = np.asarray( y , dtype=float )
+        if rows is None:
+            rows = range( len( y ) )
+        if y.size != 0:
+            y0 = np.nanmin( y , axis=1 )
+            y1 = np.nanmax( y , axis=1 )
+        for j, i in enumerate( rows ):
+            self._set( i , x[j] if x.ndim == 2 else x , y[j] ,
+                       ( y0[j] , y1[j] ) if y.size != 0 else None )
+        self._changed()
+
+    def setRowData(self, i, x, y):
+        self._set( i , x , y )
+        self._changed()
+
+    def setPen(self, i, pen):
+        self._pens[i] = pg.mkPen( pen )
+        self.update()
+
+    def _set(self, i, x, y, yr=None):
+        x = np.asarray( x , dtype=float )
+        y = np.asarray( y , dtype=float )
+        if x.size == 0 or x.size != y.size:
+            self._x[i] = self._y[i] = None
+            self._bounds[i] = None
+        else:
+            self._x[i] , self._y[i] = x , y
+            if yr is None:
+                yr = ( np.nanmin( y ) , np.nanmax( y ) )
+            self._bounds[i] = ( x[0] , x[-1] ) + tuple( yr )
+        self._paths[i] = None
+
+    def _changed(self):
+        # once per change of bounds not yet read back, not once per row
+        if not self._geom:
+            self._geom = True
+            self.prepareGeometryChange()
+        self._bbox = None
+        self.update()
+
+    def boundingRect(self):
+        if self._bbox is None:
+            b = np.array( [ r for r in self._bounds if r is not None ] , dtype=float ).reshape( -1 , 4 )
+            if len( b ) == 0:
+                self._bbox = QtCore.QRectF()
+            else:
+                x0 = float( b[:,0].min() ) ; x1 = float( b[:,1].max() )
+                y0 = float( np.nanmin( b[:,2] ) ) ; y1 = float( np.nanmax( b[:,3] ) )
+                self._bbox = QtCore.QRectF( x0 , y0 , x1 - x0 , y1 - y0 )
+            self._geom = False
+        return self._bbox
+
+    def paint(self, p, opt, widget=None):
+        t0 = time.perf_counter() if self.perf is not None else None
+        for i in range( len( self._pens ) ):
+            if self._x[i] is None:
+                continue
+            path = self._paths[i]
+            if path is None:
+                path = self._paths[i] = pg.arrayToQPath( self._x[i] , self._y[i] , connect='finite' )
+            p.setPen( self._pens[i] )
+            p.drawPath( path )
+        if t0 is not None:
+            self.perf.record( 'paint.traces' , 1000.0 * ( time.perf_counter() - t0 ) )
+
+
+class _TraceRow:
+    # one row of a MultiTraceItem, w/ the PlotCurveItem calls used here
+    __slots__ = ( 'item' , 'i' )
+
+    def __init__(self, item, i):
+        self.item = item
+        self.i = i
+
+    def setData(self, x, y):
+        self.item.setRowData( self.i , x , y )
+
+    def setPen(self, pen):
+        self.item.setPen( self.i , pen )
+
+
 # --------------------------------------------------------------------------------
 #
 # text updater
@@ -1585,21 +2358,32 @@ class XRangeSelector(QtCore.QObject):
 
 
 class TextBatch(pg.GraphicsObject):
+    """
+    Many short labels at (x, y), drawn in one paint().  Prepared text
+    (and, in device mode, each label w/ its background pre-rendered to a
+    pixmap) is kept across setData() calls in an LRU cache, so repeated
+    labels (channel names, clock ticks) cost only a blit per frame.
+    """
+
     def __init__(self, viewbox: pg.ViewBox, font: QtGui.QFont=None,
                  color=(255,255,255), mode='device',
-                 bg=(0,0,0,170), pad=(6,3), radius=3, outline=None):
+                 bg=(0,0,0,170), pad=(6,3), radius=3, outline=None,
+                 cache_size=2048):
         super().__init__()
         self.vb = viewbox
         self.mode = mode
         self.font = font or QtGui.QFont("Sans Serif", 10)
         self.color = pg.mkColor(color)
+        self.text_pen = pg.mkPen(self.color)
         self.bg_brush = None if bg is None else pg.mkBrush(bg)
         self.bg_pen = QtGui.QPen(QtCore.Qt.NoPen) if not outline else pg.mkPen(outline)
         self.pad_x, self.pad_y = pad
         self.radius = radius
         self._x = np.empty(0); self._y = np.empty(0)
-        self._labels = []
-        self._stat = {}
+        self._labels = np.empty(0, dtype=object)
+        self._cache_size = cache_size
+        self._stat = OrderedDict()   # label -> QStaticText
+        self._pix = OrderedDict()    # ( label , dpr ) -> QPixmap
         self._bbox = QtCore.QRectF()
 
                 
@@ -1607,8 +2391,7 @@ class TextBatch(pg.GraphicsObject):
         x = np.asarray(x, float); y = np.asarray(y, float)
         assert len(x) == len(y) == len(labels)
         self._x, self._y = x, y
-        self._labels = list(map(str, labels))
-        self._stat.clear()
+        self._labels = np.asarray(list(map(str, labels)), dtype=object)
         self._rebuild_bbox()
         self.update()
 
@@ -1629,14 +2412,41 @@ class TextBatch(pg.GraphicsObject):
     def boundingRect(self):
         return self._bbox
 
+    def _lru(self, cache, key, make):
+        v = cache.get(key)
+        if v is None:
+            v = cache[key] = make()
+            if len(cache) > self._cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return v
+
     def _qstatic(self, s: str) -> QtGui.QStaticText:
-        st = self._stat.get(s)
-        if st is None:
+        def make():
             st = QtGui.QStaticText(s)
             st.setTextFormat(QtCore.Qt.PlainText)
             st.prepare(font=self.font)
-            self._stat[s] = st
-        return st
+            return st
+        return self._lru(self._stat, s, make)
+
+    def _pixmap(self, s: str, dpr: float) -> QtGui.QPixmap:
+        # label + background, pre-rendered at the device pixel ratio
+        def make():
+            st = self._qstatic(s)
+            sz = st.size()
+            w = sz.width() + 2*self.pad_x + 2
+            h = sz.height() + 2*self.pad_y + 2
+            pm = QtGui.QPixmap(int(np.ceil(w * dpr)), int(np.ceil(h * dpr)))
+            pm.setDevicePixelRatio(dpr)
+            pm.fill(QtCore.Qt.transparent)
+            qp = QtGui.QPainter(pm)
+            qp.setRenderHint(QtGui.QPainter.Antialiasing)
+            qp.setFont(self.font)
+            self._draw_with_bg(qp, QtCore.QPointF(self.pad_x + 1, self.pad_y + 1), st)
+            qp.end()
+            return pm
+        return self._lru(self._pix, (s, dpr), make)
 
     def _draw_with_bg(self, p: QtGui.QPainter, top_left: QtCore.QPointF, st: QtGui.QStaticText):
         if self.bg_brush is not None:
@@ -1652,7 +2462,7 @@ class TextBatch(pg.GraphicsObject):
             else:
                 p.drawRect(r)
         # text color
-        p.setPen(pg.mkPen(self.color))
+        p.setPen(self.text_pen)
         p.drawStaticText(top_left, st)
 
     def paint(self, p: QtGui.QPainter, opt, widget=None):
@@ -1667,21 +2477,22 @@ class TextBatch(pg.GraphicsObject):
 
         if self.mode == 'data':
             # text and bg scale with view (data coords)
-            for xi, yi, lab in zip(self._x[m], self._y[m], np.asarray(self._labels, object)[m]):
+            for xi, yi, lab in zip(self._x[m], self._y[m], self._labels[m]):
                 st = self._qstatic(lab)
                 self._draw_with_bg(p, QtCore.QPointF(xi, yi), st)
             return
 
-        # device mode: constant pixel size (screen coords)
+        # device mode: constant pixel size (screen coords); all positions
+        # mapped at once w/ the item->device transform
+        tr = p.transform()
+        x, y = self._x[m], self._y[m]
+        dx = x * tr.m11() + y * tr.m21() + tr.dx() - self.pad_x - 1
+        dy = x * tr.m12() + y * tr.m22() + tr.dy() - self.pad_y - 1
+        dpr = widget.devicePixelRatioF() if widget is not None else 1.0
         p.save()
         p.resetTransform()
-        mv = self.vb.mapViewToDevice
-        for xi, yi, lab in zip(self._x[m], self._y[m], np.asarray(self._labels, object)[m]):
-            dp = mv(QtCore.QPointF(float(xi), float(yi)))
-            if dp is None:
-                continue
-            st = self._qstatic(lab)
-            self._draw_with_bg(p, dp, st)
+        for xi, yi, lab in zip(dx.tolist(), dy.tolist(), self._labels[m]):
+            p.drawPixmap(QtCore.QPointF(xi, yi), self._pixmap(lab, dpr))
         p.restore()
 
 
@@ -1732,11 +2543,12 @@ class TrackManager:
         for t in self.tracks.values():
             # Respect original pen when borders are on; hide borders when off
             eff = self._effective_pen(t["pen"])
-            t["item"].setOpts(pen=eff)
+            t["item"].setPen(eff)
 
     def update_track(self, name, x0, x1, y0, y1, color=None, pen=None, reduce=False ):
         """
-        Replace the given track with new rectangles spanning [x0,x1] × [y0,y1].
+        Replace the rectangles of the given track with [x0,x1] × [y0,y1]
+        (in place: each track keeps one persistent RectBatchItem).
         Arrays must be equal length.
         """
         x0 = np.asarray(x0)
@@ -1756,25 +2568,19 @@ class TrackManager:
         if pen is None and name not in self.tracks:
             pen = (0, 0, 0)
 
-        # remove old
-        if name in self.tracks:
-            self.plot.removeItem(self.tracks[name]["item"])
-
-        # make line,box effect
-        vb = self.plot.getViewBox()
-        if reduce:
-            x0_all, x1_all, y0_all, y1_all = build_dual_rect_arrays(vb, x0, x1, y0, y1, hfrac=0.5)
-        else:
-            x0_all = x0
-            x1_all = x1
-            y0_all = y0
-            y1_all = y1
+        # update existing item in place, or create one (w/ adaptive pen)
+        t = self.tracks.get(name)
+        if t is None:
+            item = RectBatchItem(brush=color, pen=self._effective_pen(pen))
+            self.plot.addItem(item)
+            t = self.tracks[name] = {"item": item, "color": color, "pen": pen, "visible": True}
+        elif t["color"] != color:
+            t["item"].setBrush(color)
+            t["color"] = color
 
-        # Create item with adaptive pen
-        eff_pen = self._effective_pen(pen)
-        item = pg.BarGraphItem(x0=x0_all, x1=x1_all, y0=y0_all, y1=y1_all, brush=color, pen=eff_pen, name=name)
-        self.plot.addItem(item)
-        self.tracks[name] = {"item": item, "color": color, "pen": pen, "visible": True}            
+        # make line,box effect (tick + half-height body, built when drawn)
+        t["item"].setTicks(0.5 if reduce else None)
+        t["item"].setRects(x0, x1, y0, y1)
 
         # Initialize border state if first time
         if self._borders_on is None:
@@ -1797,70 +2603,104 @@ class TrackManager:
 
 
 
-                
-# ------------------------------------------------------------
+# --------------------------------------------------------------------------------
+# persistent rect batch (one per annotation track)
 
-import numpy as np
+from pyqtgraph.Qt import internals
 
-def build_dual_rect_arrays(vb, x0, x1, y0, y1, hfrac=0.66, wpx = 1 ):
+class RectBatchItem(pg.GraphicsObject):
     """
-    Returns x0_all, x1_all, y0_all, y1_all that include:
-      - a 1-px wide full-height strip at each left edge
-      - a 66% height body for the remainder
-    vb: pyqtgraph ViewBox (for pixel→data conversion)
+    Filled rectangles [x0,x1] x [y0,y1] held in NumPy arrays that are
+    updated in place; paint() culls to the visible x-range and draws the
+    rest with one QPainter.drawRects call.  Geometry is snapped to device
+    pixels at paint time (min. 1 px wide); in 'ticks' mode, each rect is
+    drawn as a 1-px full-height tick at its start plus a body of `hfrac`
+    of its height.
     """
-    x0 = np.asarray(x0); x1 = np.asarray(x1)
-    y0 = np.asarray(y0); y1 = np.asarray(y1)
-
-    # normalize heights
-    ylo = np.minimum(y0, y1)
-    yhi = np.maximum(y0, y1)
-    h   = yhi - ylo
-    ym  = 0.5 * (yhi + ylo)
-
-    # 1 pixel in data units
-    dx, _ = vb.viewPixelSize()
-    w1 = dx  # exact 1 px
-
-    # thin strip: [x0, x0+w1] at full height
-    x0_thin = x0
-    x1_thin = x0 + w1 * wpx
-    y0_thin = ylo
-    y1_thin = yhi
-
-    # body: [x0+w1, x1] at 66% height centered
-    y0_body = ym - 0.5 * h * hfrac
-    y1_body = ym + 0.5 * h * hfrac
-    x0_body = x0 + w1 * wpx
-    x1_body = x1
-
-    # concatenate both sets
-    x0_all = np.concatenate([x0_thin, x0_body])
-    x1_all = np.concatenate([x1_thin, x1_body])
-    y0_all = np.concatenate([y0_thin, y0_body])
-    y1_all = np.concatenate([y1_thin, y1_body])
-
-    return x0_all, x1_all, y0_all, y1_all
-
-
 
-# ------------------------------------------------------------
-        
-@staticmethod
-def _ensure_min_px_width(vb, x0, x1, px=1):
-    x0 = np.asarray(x0, dtype=float)
-    x1 = np.asarray(x1, dtype=float)
+    def __init__(self, brush=(200, 250, 240), pen=None):
+        super().__init__()
+        self._brush = pg.mkBrush(brush)
+        self._pen = pg.mkPen(pen)
+        self._r = np.empty((0, 4))   # x0, x1, y0, y1
+        self._n = 0
+        self._bbox = QtCore.QRectF()
+        self._hfrac = None
+        self._rects = internals.PrimitiveArray(QtCore.QRectF, 4)
+
+    def setTicks(self, hfrac):
+        # None: plain rects
+        if hfrac != self._hfrac:
+            self._hfrac = hfrac
+            self.update()
+
+    def setRects(self, x0, x1, y0, y1):
+        n = len(x0)
+        if n > self._r.shape[0] or n < self._r.shape[0] // 4:
+            self._r = np.empty((max(n, 16), 4))
+        r = self._r[:n]
+        r[:, 0] = x0; r[:, 1] = x1; r[:, 2] = y0; r[:, 3] = y1
+        self._n = n
+        self.prepareGeometryChange()
+        if n == 0:
+            self._bbox = QtCore.QRectF()
+        else:
+            xa = float(np.min(r[:, 0])); xb = float(np.max(r[:, 1]))
+            ya = float(np.min(r[:, 2:])); yb = float(np.max(r[:, 2:]))
+            self._bbox = QtCore.QRectF(xa, ya, xb - xa, yb - ya)
+        self.update()
 
-    dx, _ = vb.viewPixelSize()
-    wmin = px * dx
-    w = x1 - x0
-    too_narrow = w < wmin
-    xc = 0.5 * (x0 + x1)
-    x0a = np.where(too_narrow, xc - 0.5*wmin, x0)
-    x1a = np.where(too_narrow, xc + 0.5*wmin, x1)
-    return x0a, x1a
+    def setBrush(self, brush):
+        self._brush = pg.mkBrush(brush)
+        self.update()
 
+    def setPen(self, pen):
+        self._pen = pg.mkPen(pen)
+        self.update()
 
+    def boundingRect(self):
+        return self._bbox
 
+    def paint(self, p, opt, widget=None):
+        if self._n == 0:
+            return
+        r = self._r[:self._n]
+        vb = self.getViewBox()
+        if vb is not None:
+            (xmin, xmax), _ = vb.viewRange()
+            r = r[(r[:, 1] >= xmin) & (r[:, 0] <= xmax)]
+        if r.shape[0] == 0:
+            return
 
+        # to device pixels (view transforms are scale + translate only)
+        tr = p.transform()
+        xa = r[:, 0] * tr.m11() + tr.dx(); xb = r[:, 1] * tr.m11() + tr.dx()
+        ya = r[:, 2] * tr.m22() + tr.dy(); yb = r[:, 3] * tr.m22() + tr.dy()
+        px0 = np.floor(np.minimum(xa, xb))
+        px1 = np.maximum(np.floor(np.maximum(xa, xb)), px0 + 1)
+        py0 = np.minimum(ya, yb)
+        ph = np.maximum(ya, yb) - py0
+
+        n = r.shape[0]
+        if self._hfrac is None:
+            self._rects.resize(n)
+            a = self._rects.ndarray()   # x, y, w, h
+            a[:, 0] = px0; a[:, 1] = py0; a[:, 2] = px1 - px0; a[:, 3] = ph
+        else:
+            # ticks, then bodies (where wider than the tick)
+            body = np.flatnonzero(px1 > px0 + 1)
+            self._rects.resize(n + body.size)
+            a = self._rects.ndarray()
+            a[:n, 0] = px0; a[:n, 1] = py0; a[:n, 2] = 1; a[:n, 3] = ph
+            bh = ph[body] * self._hfrac
+            a[n:, 0] = px0[body] + 1
+            a[n:, 1] = py0[body] + 0.5 * (ph[body] - bh)
+            a[n:, 2] = px1[body] - px0[body] - 1
+            a[n:, 3] = bh
 
+        p.save()
+        p.resetTransform()
+        p.setPen(self._pen)
+        p.setBrush(self._brush)
+        p.drawRects(*self._rects.drawargs())
+        p.restore()
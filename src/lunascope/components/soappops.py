@@ -24,9 +24,11 @@ from PySide6.QtCore import Qt
 import os
 from pathlib import Path
 import pandas as pd
+from collections import OrderedDict
 
 from .mplcanvas import MplCanvas
 from .plts import hypno_density, hypno
+from .jobs import ANALYSIS
         
 class SoapPopsMixin:
 
@@ -44,8 +46,10 @@ class SoapPopsMixin:
 
         # CONTAINS stages allows for possible conflicting stages
         try:
-            res = self.p.silent_proc('CONTAINS stages')
-            df = self.p.table( 'CONTAINS' )
+            with self._luna_lock:
+                res = self.p.silent_proc('CONTAINS stages')
+                df = self.p.table( 'CONTAINS' )
+                df2 = self.p.table( 'CONTAINS' , 'E' )
         except Exception:
             return False
 
@@ -66,7 +70,6 @@ class SoapPopsMixin:
                     return False
 
             # any conflicts (will generate an 'E' table) 
-            df2 = self.p.table( 'CONTAINS' , 'E' )
             if 'df2' in locals() and isinstance(df2, pd.DataFrame) and not df2.empty:
                 return False
                 
@@ -97,13 +100,19 @@ class SoapPopsMixin:
         self.ui.butt_pops.clicked.connect( self._calc_pops )
 
         self.ui.radio_pops_hypnodens.toggled.connect( self._render_pops_hypno )
+
+        # SOAP / POPS output tables, by ( 'soap' | 'pops' , record state ,
+        # channel , pc | model ); most recent last (cleared on attach)
+        self.sp_cache = OrderedDict()
+        self.sp_cache_max = 16
         
     def _update_soap_list(self):
 
         if not hasattr(self, "p"): return
 
         # list all channels with sample frequencies > 32 Hz 
-        df = self.p.headers()
+        with self._luna_lock:
+            df = self.p.headers()
 
         if df is not None:
             chs = df.loc[df['SR'] >= 32, 'CH'].tolist()
@@ -139,16 +148,42 @@ class SoapPopsMixin:
         soap_ch = self.ui.combo_soap.currentText()
         soap_pc = self.ui.spin_soap_pc.value()
 
-        # run SOAP
-        try:
-            cmd_str = 'EPOCH align & SOAP sig=' + soap_ch + ' epoch pc=' + str(soap_pc)
-            self.p.eval( cmd_str )
-        except Exception:
-            QMessageBox.critical( self.ui , "Error", "Problem running SOAP" )
+        # same record state / channel / pc as before: reuse
+        key = ( 'soap' , self.inst_state , soap_ch , soap_pc )
+        res = self._sp_get( key )
+        if res is not None:
+            self._show_soap( res )
             return
+
+        # run SOAP on the Luna worker
+        cmd_str = 'EPOCH align & SOAP sig=' + soap_ch + ' epoch pc=' + str(soap_pc)
+        self._sp_submit( "Running SOAP…" , self._soap_worker , cmd_str ,
+                         lambda job : self._soap_done( job , key ) )
+
+
+    def _soap_worker(self, p, cmd_str):
+        # worker thread: do not touch the GUI
+        with self._luna_lock:
+            p.eval( cmd_str )
+            return { 'CH' : p.table( 'SOAP' , 'CH' ) ,
+                     'CH_E' : p.table( 'SOAP' , 'CH_E' ) }
+
+    def _soap_done(self, job, key):
+        try:
+            if job.cancelled:
+                return
+            if job.error is not None:
+                QMessageBox.critical( self.ui , "Error", "Problem running SOAP" )
+                return
+            self._sp_put( key , job.result )
+            self._show_soap( job.result )
+        finally:
+            self._sp_finish()
+
+    def _show_soap(self, res):
             
         # channel details
-        df = self.p.table( 'SOAP' , 'CH' )        
+        df = res[ 'CH' ]
         df = df[ [ 'K' , 'K3' , 'ACC', 'ACC3' ] ]
 
         for c in df.columns:
@@ -167,7 +202,7 @@ class SoapPopsMixin:
         
         
         # hypnodensities
-        df = self.p.table( 'SOAP' , 'CH_E' )
+        df = res[ 'CH_E' ]
         df = df[ [ 'PRIOR', 'PRED' , 'PP_N1' , 'PP_N2', 'PP_N3', 'PP_R', 'PP_W' , 'DISC' ] ]                                                     
         hypno_density( df , ax=self.soapcanvas.ax)                                                                                               
         self.soapcanvas.draw_idle()                                                                                                              
@@ -227,26 +262,58 @@ class SoapPopsMixin:
         self.curr_anns = self.ui.tbl_desc_annots.checked()
 
         
-        # run POPS
-        try:
-            cmd_str = 'EPOCH align & RUN-POPS sig=' + pops_chs
-            cmd_str += ' path=' + pops_path
-            cmd_str += ' model=' + pops_model
-            cmd_str += opts
-                        
-            self.p.eval( cmd_str )
-            
-        except (RuntimeError) as e:
-            QMessageBox.critical(
-                self.ui,
-                "Error running POPS",
-                f"Exception: {type(e).__name__}: {e}"
-            )
+        # same record state / channel / model as before: reuse, unless
+        # this run would add staging to the record (no observed staging,
+        # or ignore-obs)
+        key = ( 'pops' , self.inst_state , pops_chs , str( pops_mod ) )
+        res = self._sp_get( key ) if has_staging else None
+        if res is not None:
+            self._show_pops( res , has_staging , cached = True )
             return
 
+        # run POPS on the Luna worker
+        cmd_str = 'EPOCH align & RUN-POPS sig=' + pops_chs
+        cmd_str += ' path=' + pops_path
+        cmd_str += ' model=' + pops_model
+        cmd_str += opts
+        self._sp_submit( "Running POPS…" , self._pops_worker , cmd_str ,
+                         lambda job : self._pops_done( job , key , has_staging ) )
+
+
+    def _pops_worker(self, p, cmd_str):
+        # worker thread: do not touch the GUI
+        # (all output tables are read here, as later commands replace them)
+        with self._luna_lock:
+            p.eval( cmd_str )
+            strata = p.strata()
+            tables = { }
+            if strata is not None:
+                for row in strata.itertuples(index=True):
+                    tables[ "_".join( [ row.Command , row.Strata ] ) ] = p.table( row.Command , row.Strata )
+            return { 'E' : p.table( 'RUN_POPS' , 'E' ) ,
+                     'strata' : strata ,
+                     'tables' : tables }
+
+    def _pops_done(self, job, key, has_staging):
+        try:
+            if job.cancelled:
+                return
+            if job.error is not None:
+                QMessageBox.critical(
+                    self.ui,
+                    "Error running POPS",
+                    f"Exception: {job.tb}"
+                )
+                return
+            self._sp_put( key , job.result )
+            self._show_pops( job.result , has_staging )
+        finally:
+            self._sp_finish()
+
+    def _show_pops(self, res, has_staging, cached = False):
         
         # hypnodensity plot
-        df = self.p.table( 'RUN_POPS' , 'E' )
+        df = res[ 'E' ]
         if has_staging:
             df = df[ [ 'E', 'START', 'PRIOR', 'PRED' , 'PP_N1' , 'PP_N2', 'PP_N3', 'PP_R', 'PP_W'  ] ]
         else:
@@ -256,9 +323,15 @@ class SoapPopsMixin:
 
         self._render_pops_hypno()
 
+        # a reused run: only its output tables are shown again (the record
+        # already has any annotations it added)
+        if cached:
+            self.set_tree_from_df( res[ 'strata' ] )
+            self.results = dict( res[ 'tables' ] )
+            return
+
         # populate main output and update annotations (e.g. N1, N2, ... or pN1, pN2, ...)
-        tbls = self.p.strata()
-        self._render_tables( tbls )
+        self._render_tables( res[ 'strata' ] , res[ 'tables' ] )
 
         # if did not have original staging, we will create a new one
         if not has_staging:
@@ -266,6 +339,40 @@ class SoapPopsMixin:
             self._update_hypnogram()
 
 
+    # ------------------------------------------------------------
+    # SOAP / POPS jobs
+
+    def _sp_submit(self, msg, fn, cmd_str, done):
+        self._busy = True
+        self._buttons( False )
+        self.sb_progress.setVisible(True)
+        self.sb_progress.setRange(0, 0)
+        self.sb_progress.setFormat(msg)
+        self.lock_ui()
+        tok = self._start_job()
+        self.jobs.submit( fn , self.p , cmd_str ,
+                          prio = ANALYSIS , pool = 'luna' , tok = tok , done = done )
+
+    def _sp_finish(self):
+        self.unlock_ui()
+        self._end_job()
+        self._busy = False
+        self._buttons( True )
+        self.sb_progress.setRange(0, 100); self.sb_progress.setValue(0)
+        self.sb_progress.setVisible(False)
+
+    def _sp_get(self, key):
+        res = self.sp_cache.get( key )
+        if res is not None:
+            self.sp_cache.move_to_end( key )
+        return res
+
+    def _sp_put(self, key, res):
+        self.sp_cache[ key ] = res
+        self.sp_cache.move_to_end( key )
+        while len( self.sp_cache ) > self.sp_cache_max:
+            self.sp_cache.popitem( last = False )
+
 
     def _render_pops_hypno(self):
 
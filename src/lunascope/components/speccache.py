@@ -0,0 +1,136 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------
+#
+# on-disk cache of spectrogram matrices
+#
+# ------------------------------------------------------------
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "lunascope", "spectrograms")
+
+
+def edf_file_id(edf_file):
+    """( path , size , mtime ) of an EDF on disk, or None if it is not a readable file."""
+    try:
+        st = os.stat(edf_file)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (os.path.abspath(edf_file), st.st_size, st.st_mtime_ns)
+
+
+def edf_identity(edf_file, headers):
+    """
+    ( path , size , mtime , header hash ) of an EDF on disk, or None if
+    it is not a readable file.
+    """
+    fid = edf_file_id(edf_file)
+    if fid is None:
+        return None
+    h = hashlib.sha1()
+    if headers is not None:
+        h.update(pd.util.hash_pandas_object(headers, index=False).to_numpy().tobytes())
+    return fid + (h.hexdigest(),)
+
+
+class SpecDiskCache:
+    """
+    ( epochs , freqs , F x E matrix ) as compressed .npz files, one per
+    key; a key is the EDF identity (see edf_identity), channel, frequency
+    range, mask state and engine settings.  Files are written atomically, so a directory
+    may be shared by several users or sessions.  Oldest entries are
+    removed once the total exceeds `max_bytes`.
+    """
+
+    def __init__(self, root=None, max_bytes=2 * 2**30):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, edf_id, ch, minf, maxf, mask, engine=("luna",)):
+        s = json.dumps([list(edf_id), ch, float(minf), float(maxf), list(mask), list(engine)])
+        return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                res = f["epochs"], f["freqs"], f["z"]
+        except (OSError, KeyError, ValueError):
+            return None
+        try:
+            os.utime(path)   # recently used: pruned last
+        except OSError:
+            pass
+        return res
+
+    def put(self, key, xi, yi, zi):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, epochs=xi, freqs=yi, z=zi)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._prune()
+
+    def _prune(self):
+        files = []
+        for d, _, names in os.walk(self.root):
+            for n in names:
+                if n.endswith(".npz"):
+                    p = os.path.join(d, n)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, p))
+        total = sum(f[1] for f in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                pass
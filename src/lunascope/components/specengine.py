@@ -0,0 +1,88 @@
+#  --------------------------------------------------------------------
+#
+#  This file is part of Luna.
+#
+#  LUNA is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  Luna is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Luna. If not, see <http:#www.gnu.org/licenses/>.
+#
+#  Please see LICENSE.txt for more details.
+#
+#  --------------------------------------------------------------------
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal.windows import dpss, hann
+
+
+# ------------------------------------------------------------
+#
+# epoch spectra from raw signals (Welch / multitaper), NumPy only
+#
+# ------------------------------------------------------------
+
+def _tapers(n, fs, method, nw):
+    # ( K , n ) tapers, each scaled for a one-sided PSD in units^2/Hz
+    if method == "multitaper":
+        k = max(1, int(2 * nw) - 1)
+        w = np.atleast_2d(dpss(n, nw, Kmax=k))
+    else:
+        w = hann(n, sym=False)[None, :]
+    return w / np.sqrt(fs * np.sum(w * w, axis=1, keepdims=True))
+
+
+def epoch_spectra(t, y, fs, minf, maxf, epoch=30.0, seg=4.0, overlap=0.5,
+                  method="welch", nw=3.0, chunk=64):
+    """
+    Per-epoch power spectra (dB) of one signal w/ time-track t (secs):
+    full `epoch`-second epochs are cut out as strided views, split into
+    `seg`-second segments overlapping by `overlap`, detrended (mean),
+    tapered (Hann, or DPSS for method='multitaper') and transformed in
+    batches of `chunk` epochs with one rfft.  Returns ( epochs (1-based) ,
+    freqs , F x E matrix ) for freqs in [minf, maxf], as epoch_matrix().
+    """
+    fs = float(fs)
+    n = int(round(epoch * fs))
+    m = max(2, min(n, int(round(seg * fs))))
+    step = max(1, int(round(m * (1.0 - overlap))))
+
+    # full epochs only: each a contiguous run of n samples
+    e = np.floor(np.asarray(t) / epoch).astype(np.int64)
+    ev, first, cnt = np.unique(e, return_index=True, return_counts=True)
+    keep = cnt == n
+    ev, first = ev[keep], first[keep]
+
+    f = np.fft.rfftfreq(m, 1.0 / fs)
+    fsel = (f >= minf) & (f <= maxf)
+    if ev.size == 0 or not fsel.any():
+        return np.empty(0), np.empty(0), np.empty((0, 0))
+
+    w = _tapers(m, fs, method, nw)
+    epochs = sliding_window_view(np.asarray(y, dtype=np.float64), n)
+    out = np.empty((ev.size, int(fsel.sum())))
+    for i in range(0, ev.size, chunk):
+        x = epochs[first[i:i + chunk]]                        # ( E , n )
+        x = sliding_window_view(x, m, axis=-1)[:, ::step]     # ( E , S , m )
+        x = x - x.mean(axis=-1, keepdims=True)
+        X = np.fft.rfft(x[:, :, None, :] * w, axis=-1)        # ( E , S , K , F )
+        p = (X.real ** 2 + X.imag ** 2).mean(axis=(1, 2))
+        # one-sided: double all but DC (and Nyquist, for even m)
+        p[:, 1:(m + 1) // 2] *= 2
+        out[i:i + chunk] = p[:, fsel]
+
+    with np.errstate(divide="ignore"):
+        db = 10 * np.log10(out)
+
+    xi = np.arange(ev[0], ev[-1] + 1)
+    zi = np.full((int(fsel.sum()), xi.size), np.nan)
+    zi[:, ev - ev[0]] = db.T
+    return xi + 1, f[fsel], zi
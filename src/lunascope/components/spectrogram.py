@@ -21,65 +21,171 @@
 #  --------------------------------------------------------------------
 
 import lunapi as lp
-import io
+import time
 import numpy as np
+import pyqtgraph as pg
+import pyqtgraph.exporters
+from collections import OrderedDict
 
-from PySide6.QtWidgets import QVBoxLayout
-from PySide6 import QtCore, QtWidgets, QtGui
+from PySide6.QtWidgets import QVBoxLayout, QMessageBox
+from PySide6 import QtCore, QtWidgets
 
-from concurrent.futures import ThreadPoolExecutor
-from PySide6.QtCore import QMetaObject, Q_ARG, Qt, Slot
+from .plts import hjorth_image, hjorth_stats
+from .jobs import ANALYSIS
+from .speccache import SpecDiskCache, edf_file_id, edf_identity
+from .specengine import epoch_spectra
+
+# ------------------------------------------------------------
+# long-form ( epoch , frequency , value ) rows -> F x E matrix
+
+def epoch_matrix( e , f , z ):
+    """( epochs , freqs , F x E matrix ): a column for every epoch in range (missing = NaN)."""
+    if len(z) == 0:
+        return np.empty(0), np.empty(0), np.empty((0, 0))
+    e0 = e.min()
+    xi = np.arange(e0, e.max() + 1)
+    yi, fidx = np.unique(f, return_inverse=True)
+    zi = np.full((yi.size, xi.size), np.nan)
+    zi[fidx, e - e0] = z
+    return xi, yi, zi
 
-from .mplcanvas import MplCanvas
-from .plts import plot_hjorth, plot_spec
 
 class SpecMixin:
 
     def _init_spec(self):
 
         self.ui.host_spectrogram.setLayout(QVBoxLayout())
-        self.spectrogramcanvas = MplCanvas(self.ui.host_spectrogram)
+        self.specplot = pg.PlotWidget( self.ui.host_spectrogram )
         self.ui.host_spectrogram.layout().setContentsMargins(0,0,0,0)
-        self.ui.host_spectrogram.layout().addWidget( self.spectrogramcanvas )
+        self.ui.host_spectrogram.layout().addWidget( self.specplot )
+
+        # one image (spectrogram or Hjorth), x in epochs; no pan/zoom, so
+        # paging the main view never redraws it
+        pi = self.specplot.getPlotItem()
+        pi.hideButtons()
+        pi.setMenuEnabled(False)
+        vb = pi.getViewBox()
+        vb.setMouseEnabled(x=False, y=False)
+        vb.setMenuEnabled(False)
+        vb.wheelEvent = lambda ev: None
+        vb.mouseDragEvent = lambda ev: None
+        self.spec_img = pg.ImageItem( autoDownsample=True )
+        pi.addItem( self.spec_img )
+        self.spec_lut = pg.colormap.getFromMatplotlib( 'turbo' ).getLookupTable( nPts = 256 )
+
+        # overlay: current main-view window, and its midpoint
+        self.spec_region = pg.LinearRegionItem( movable=False , brush=(255,255,255,50) ,
+                                                pen=pg.mkPen(255,255,255,160) )
+        self.spec_cursor = pg.InfiniteLine( angle=90 , movable=False , pen=pg.mkPen(255,255,255,220) )
+        for item in ( self.spec_region , self.spec_cursor ):
+            item.setZValue(10)
+            item.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+            item.hide()
+            pi.addItem( item , ignoreBounds=True )
+
+        # click on a column: move the main view there
+        self.specplot.scene().sigMouseClicked.connect( self._spec_clicked )
 
         # wiring
         self.ui.butt_spectrogram.clicked.connect( self._calc_spectrogram )
         self.ui.butt_hjorth.clicked.connect( self._calc_hjorth )
+        self.ui.combo_spectrogram.currentTextChanged.connect( self._spec_channel_changed )
+
+        self.ui.spin_lwrfrq.valueChanged.connect( self._spec_params_changed )
+        self.ui.spin_uprfrq.valueChanged.connect( self._spec_params_changed )
+        self.ui.spin_win.valueChanged.connect( self._spec_params_changed )
+        self.ui.combo_spec_engine.currentIndexChanged.connect( self._spec_params_changed )
+        self.ui.spin_spec_seg.valueChanged.connect( self._spec_params_changed )
+        self.ui.spin_spec_overlap.valueChanged.connect( self._spec_params_changed )
+
+        # epoch spectra, by ( record state , channel , engine ): ( minf , maxf ,
+        # epochs , freqs , F x E matrix in dB, not winsorized )
+        self.spec_cache = { }
+
+        # ... and across sessions, on disk
+        self.spec_disk = SpecDiskCache()
+        self._spec_edf_id = None
+
+        # per-epoch Hjorth stats, by ( record state , channel )
+        self.hjorth_cache = OrderedDict()
+        self.hjorth_cache_max = 64
+
+        # what the canvas currently shows: None, 'spec' or 'hjorth'
+        self.spec_view = None
 
         # context menu
-        self.spectrogramcanvas.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
-        self.spectrogramcanvas.customContextMenuRequested.connect(self._spec_context_menu)
+        self.specplot.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.specplot.customContextMenuRequested.connect(self._spec_context_menu)
 
 
     # ------------------------------------------------------------    
     # right-click menus to save/copy images
 
     def _spec_context_menu(self, pos):
-        menu = QtWidgets.QMenu(self.spectrogramcanvas)
+        menu = QtWidgets.QMenu(self.specplot)
         act_copy = menu.addAction("Copy to Clipboard")
         act_save = menu.addAction("Save Figure…")
-        action = menu.exec(self.spectrogramcanvas.mapToGlobal(pos))
+        action = menu.exec(self.specplot.mapToGlobal(pos))
         if action == act_copy:
             self._spec_copy_to_clipboard()
         elif action == act_save:
             self._spec_save_figure()
             
     def _spec_copy_to_clipboard(self):
-        buf = io.BytesIO()
-        self.spectrogramcanvas.figure.savefig(buf, format="png", bbox_inches="tight")
-        img = QtGui.QImage.fromData(buf.getvalue(), "PNG")
+        img = self.specplot.grab().toImage()
         QtWidgets.QApplication.clipboard().setImage(img)
         
     def _spec_save_figure(self):
         fn, _ = QtWidgets.QFileDialog.getSaveFileName(
-            self.spectrogramcanvas,
+            self.specplot,
             "Save Figure",
             "spectrogram",
-            "PNG (*.png);;SVG (*.svg);;PDF (*.pdf)"
+            "PNG (*.png);;SVG (*.svg)"
         )
         if not fn:
             return
-        self.spectrogramcanvas.figure.savefig(fn, bbox_inches="tight")
+        pi = self.specplot.getPlotItem()
+        if fn.lower().endswith(".svg"):
+            pg.exporters.SVGExporter( pi ).export( fn )
+        else:
+            pg.exporters.ImageExporter( pi ).export( fn )
+
+
+    # ------------------------------------------------------------
+    # link to the main view: overlay follows the window, clicks move it
+
+    def _spec_follow(self, lo, hi):
+        # called per drawn frame: only the overlay moves, never the image
+        if self.spec_view is None:
+            return
+        x1 = lo / 30.0 + 0.5
+        x2 = hi / 30.0 + 0.5
+        self.spec_region.setRegion( ( x1 , x2 ) )
+        self.spec_cursor.setValue( ( x1 + x2 ) / 2.0 )
+        self.spec_region.show()
+        self.spec_cursor.show()
+
+    def _spec_clicked(self, ev):
+        if ev.button() != QtCore.Qt.LeftButton or self.spec_view is None:
+            return
+        if getattr(self, "sel", None) is None:
+            return
+        vb = self.specplot.getPlotItem().getViewBox()
+        if not vb.sceneBoundingRect().contains( ev.scenePos() ):
+            return
+        x = vb.mapSceneToView( ev.scenePos() ).x()
+        # clicked epoch, centered in a window of the current width
+        t = ( int( round( x ) ) - 0.5 ) * 30.0
+        w = self.last_x2 - self.last_x1
+        lo = max( 0.0 , min( t - w / 2.0 , self.ns - w ) )
+        self.sel.setRange( lo , lo + w )
+        ev.accept()
+
+    def _clear_spec(self):
+        self.spec_img.clear()
+        self.spec_region.hide()
+        self.spec_cursor.hide()
+        self.spec_view = None
 
         
     # ------------------------------------------------------------
@@ -90,7 +196,8 @@ class SpecMixin:
         # clear first
         self.ui.combo_spectrogram.clear()
 
-        df = self.p.headers()
+        with self._luna_lock:
+            df = self.p.headers()
         
         if df is not None:
             chs = df.loc[df['SR'] >= 32, 'CH'].tolist()
@@ -119,7 +226,41 @@ class SpecMixin:
 
         # channel must exist in EDF (should always be the case)
         ch = self.ui.combo_spectrogram.currentText()
-        if ch not in self.p.edf.channels():
+        with self._luna_lock:
+            edf_chs = self.p.edf.channels()
+        if ch not in edf_chs:
+            return
+
+        # this channel, or all listed channels in one PSD run
+        if self.ui.check_spec_all.isChecked():
+            chs = [ self.ui.combo_spectrogram.itemText(i) for i in range( count ) ]
+            chs = [ c for c in chs if c in edf_chs ]
+        else:
+            chs = [ ch ]
+
+        # already have them (for this record state / frequency range)?
+        chs = [ c for c in chs if not self._spec_cached( c ) ]
+        if not chs:
+            self._show_spectrogram( ch )
+            return
+
+        # anything computed in an earlier session (same EDF, channel,
+        # range, masks and engine) is read from the on-disk cache
+        minf = float(self.ui.spin_lwrfrq.value())
+        maxf = float(self.ui.spin_uprfrq.value())
+        state = self.inst_state
+        eng = self._spec_engine()
+        keys = self._spec_disk_keys( chs , minf , maxf , eng )
+        todo = [ ]
+        for c in chs:
+            mat = self.spec_disk.get( keys[ c ] ) if c in keys else None
+            if mat is not None:
+                self.spec_cache[ ( state , c , eng ) ] = ( minf , maxf ) + mat
+            else:
+                todo.append( c )
+        if ch not in todo:
+            self._show_spectrogram( ch )
+        if not todo:
             return
 
         # UI busy
@@ -129,84 +270,202 @@ class SpecMixin:
         self.sb_progress.setRange(0, 0)
         self.sb_progress.setFormat("Running…")
         self.lock_ui()
+        tok = self._start_job()
+        self._spec_t0 = time.perf_counter()
+
+        # NumPy engine: one job per channel on the NumPy pool
+        if eng[0] != 'luna':
+            self._spec_todo = len( todo )
+            self._spec_err = None
+            self.sb_progress.setRange(0, len( todo ))
+            self.sb_progress.setValue(0)
+            self.sb_progress.setFormat("Spectrograms %v/%m")
+            for c in todo:
+                self.jobs.submit( self._native_spectrogram , self.p , c , self.srs[ c ] ,
+                                  minf , maxf , eng , keys.get( c ) , tok ,
+                                  prio = ANALYSIS , pool = 'numpy' , tok = tok ,
+                                  done = lambda job , _c=c : self._native_done( job , _c , state , minf , maxf , eng ) )
+            return
 
-        # submit worker
-        fut_spec = self._exec.submit(
+        # Luna PSD: one call for all channels; an analysis, so queued
+        # behind any interactive fetch / read-ahead
+        self.jobs.submit(
             self._derive_spectrogram,
             self.p,
-            ch,
-            float(self.ui.spin_lwrfrq.value()),
-            float(self.ui.spin_uprfrq.value()),
-            float(self.ui.spin_win.value())
+            todo,
+            minf,
+            maxf,
+            keys,
+            tok,
+            prio = ANALYSIS, pool = 'luna', tok = tok,
+            done = lambda job : self._spectrogram_done( job , state , minf , maxf , eng )
         )
 
-
-        # done callback runs in worker thread -> hop to GUI
-        def _done( _f = fut_spec ):
-            try:
-                self._last_result = _f.result()  # (xi, yi, zi)
-                # enqueue a call that runs in 'self' thread
-                QMetaObject.invokeMethod(self,"_spectrogram_done_ok",Qt.QueuedConnection)
-            except Exception as e:
-                self._last_exc = e
-                self._last_tb = f"{type(e).__name__}: {e}"
-                QMetaObject.invokeMethod(self, "_spectrogram_done_err", Qt.QueuedConnection)
-
-        fut_spec.add_done_callback(_done)
-
-    @Slot()
-    def _spectrogram_done_ok(self):
+    def _spectrogram_done(self, job, state, minf, maxf, eng):
+        # GUI thread
         try:
-            xi, yi, zi = self._last_result 
-            self._complete_spectrogram(xi, yi, zi)
+            if job.cancelled:
+                # nothing drawn: the previous spectrogram (if any) stays
+                return
+            if job.error is not None:
+                self._last_exc = job.error
+                self._last_tb = job.tb
+                QMessageBox.critical(self.ui, "Error deriving spectrogram", self._last_tb)
+                return
+            for ch, mat in job.result.items():
+                self.spec_cache[ ( state , ch , eng ) ] = ( minf , maxf ) + mat
+            self._spec_timing( eng , len( job.result ) )
+            self._show_spectrogram( self.ui.combo_spectrogram.currentText() )
         finally:
-            self.unlock_ui()
-            self._busy = False
-            self._buttons(True)
-            self.sb_progress.setRange(0, 100)
-            self.sb_progress.setValue(0)
-            self.sb_progress.setVisible(False)
-
-    @Slot()
-    def _spectrogram_done_err(self):
+            self._spectrogram_finish()
+
+    def _native_done(self, job, ch, state, minf, maxf, eng):
+        # GUI thread: one channel of a NumPy-engine run
+        self._spec_todo -= 1
+        if job.error is not None and self._spec_err is None:
+            self._spec_err = job.tb
+        elif job.result is not None:
+            self.spec_cache[ ( state , ch , eng ) ] = ( minf , maxf ) + job.result
+            self.sb_progress.setValue( self.sb_progress.value() + 1 )
+        if self._spec_todo:
+            return
         try:
-            from PySide6.QtWidgets import QMessageBox
-            QMessageBox.critical(self, "Error deriving spectrogram", self._last_tb)
+            if self._spec_err is not None:
+                QMessageBox.critical(self.ui, "Error deriving spectrogram", self._spec_err)
+            elif not job.tok.cancelled:
+                self._spec_timing( eng , self.sb_progress.value() )
+                self._show_spectrogram( self.ui.combo_spectrogram.currentText() )
         finally:
-            self.unlock_ui()
-            self._busy = False
-            self._buttons(True)
-            self.sb_progress.setRange(0, 100)
-            self.sb_progress.setValue(0)
-            self.sb_progress.setVisible(False)
+            self._spectrogram_finish()
+
+    def _spec_timing(self, eng, n):
+        # wall time of the run, e.g. to compare engines
+        ms = 1000.0 * ( time.perf_counter() - self._spec_t0 )
+        self.perf.record( 'spectrogram.' + eng[0] , ms )
+        self.ui.statusbar.showMessage( f"Spectrogram ({eng[0]}): {n} channel(s) in {ms:.0f} ms" , 10000 )
+
+    def _spectrogram_finish(self):
+        self.unlock_ui()
+        self._end_job()
+        self._busy = False
+        self._buttons(True)
+        self.sb_progress.setRange(0, 100)
+        self.sb_progress.setValue(0)
+        self.sb_progress.setFormat("%p%")
+        self.sb_progress.setVisible(False)
      
             
-    def _derive_spectrogram(self, p, ch, minf, maxf, w):
+    def _derive_spectrogram(self, p, chs, minf, maxf, keys, tok):
         # worker thread: do not touch GUI,
-        # return numpy arrays (by ref)
-        
-        df = p.silent_proc( "PSD min-sr=32 epoch-spectrum dB sig="+ch+" min="+str(minf)+" max="+str(maxf) )[ 'PSD: CH_E_F' ]        
-        
-        x = df['E'].to_numpy(dtype=int)
-        y = df['F'].to_numpy(dtype=float)
-        z = df[ 'PSD' ].to_numpy(dtype=float)
-
-        incl = np.zeros(len(df), dtype=bool)
-        incl[ (y >= minf) & (y <= maxf) ] = True
-        x = x[ incl ]
-        y = y[ incl ]
-        z = z[ incl ]
-        z = lp.winsorize( z , limits=[w, w] )
-        
-        xn = max(x) - min(x) + 1
-        yn = np.unique(y).size
-        zi, yi, xi = np.histogram2d(y, x, bins=(yn,xn), weights=z, density=False )
-        counts, _, _ = np.histogram2d(y, x, bins=(yn,xn))
-        with np.errstate(divide='ignore', invalid='ignore'):
-            zi = zi / counts
-            zi = np.ma.masked_invalid(zi)
-
-        return xi, yi, zi
+        # return { ch : ( epochs , freqs , F x E matrix ) } (by ref),
+        # also written to the on-disk cache for channels w/ a key
+
+        tok.check()
+        with self._luna_lock:
+            df = p.silent_proc( "PSD min-sr=32 epoch-spectrum dB sig="+",".join(chs)+" min="+str(minf)+" max="+str(maxf) )[ 'PSD: CH_E_F' ]        
+        tok.check()
+
+        out = { }
+        for ch, d in df.groupby( 'CH' , sort = False ):
+            x = d['E'].to_numpy(dtype=int)
+            y = d['F'].to_numpy(dtype=float)
+            z = d[ 'PSD' ].to_numpy(dtype=float)
+            incl = (y >= minf) & (y <= maxf)
+            out[ ch ] = epoch_matrix( x[ incl ] , y[ incl ] , z[ incl ] )
+            if ch in keys:
+                self.spec_disk.put( keys[ ch ] , *out[ ch ] )
+            tok.check()
+        return out
+
+
+    def _native_spectrogram(self, p, ch, sr, minf, maxf, eng, key, tok):
+        # worker thread (NumPy pool): slice a span at a time under the Luna
+        # lock, then FFTs w/o it (they release the GIL, so channels run in
+        # parallel)
+        d = self._slice_record( p , ch , self.ns , tok )
+        tok.check()
+        if d is None:
+            return None
+        mat = epoch_spectra( d[0] , d[1] , sr , minf , maxf ,
+                             method = eng[0] , seg = eng[1] , overlap = eng[2] )
+        del d
+        if key is not None:
+            self.spec_disk.put( key , *mat )
+        return mat
+
+
+    def _spec_engine(self):
+        # ( 'luna' , ) or ( 'welch' | 'multitaper' , window (s) , overlap )
+        i = self.ui.combo_spec_engine.currentIndex()
+        if i <= 0:
+            return ( 'luna' , )
+        return ( 'welch' if i == 1 else 'multitaper' ,
+                 float( self.ui.spin_spec_seg.value() ) ,
+                 float( self.ui.spin_spec_overlap.value() ) )
+
+
+    def _spec_disk_keys(self, chs, minf, maxf, eng):
+        # on-disk cache keys by channel; none unless the record is as
+        # loaded from its EDF, give or take masks
+        if self.inst_masks is None:
+            return { }
+        # identity of the file behind the record (path, size, mtime), the
+        # header hash only recomputed when that changes
+        try:
+            with self._luna_lock:
+                edf_file = self.p.edf.stat()['edf_file']
+        except Exception:
+            return { }
+        fid = edf_file_id( edf_file )
+        if fid is None:
+            return { }
+        if self._spec_edf_id is None or self._spec_edf_id[0] != fid:
+            try:
+                with self._luna_lock:
+                    eid = edf_identity( edf_file , self.p.headers() )
+            except Exception:
+                eid = None
+            self._spec_edf_id = ( fid , eid )
+        eid = self._spec_edf_id[1]
+        if eid is None:
+            return { }
+        return { ch : self.spec_disk.key( eid , ch , minf , maxf , self.inst_masks , eng ) for ch in chs }
+
+
+    def _spec_cached(self, ch):
+        # in-memory entry covering the current frequency range, or None
+        minf = self.ui.spin_lwrfrq.value() 
+        maxf = self.ui.spin_uprfrq.value()
+        ent = self.spec_cache.get( ( self.inst_state , ch , self._spec_engine() ) )
+        if ent is None or minf < ent[0] or maxf > ent[1]:
+            return None
+        return ent
+
+    def _show_spectrogram(self, ch):
+        # draw a cached spectrogram if it covers the current frequency
+        # range: rows in range, winsorized now (so changes are cheap)
+        minf = self.ui.spin_lwrfrq.value() 
+        maxf = self.ui.spin_uprfrq.value()
+        ent = self._spec_cached( ch )
+        if ent is None:
+            return False
+        xi, yi, zi = ent[2:]
+        rows = (yi >= minf) & (yi <= maxf)
+        yi, zi = yi[ rows ] , zi[ rows ]
+        if zi.size:
+            w = self.ui.spin_win.value()
+            zi = zi.copy()
+            m = np.isfinite( zi )
+            zi[ m ] = lp.winsorize( zi[ m ] , limits=[w, w] )
+        self._complete_spectrogram( xi , yi , zi )
+        return True
+
+    def _spec_params_changed(self, *_):
+        # frequency range / winsorization: redraw from the cache if possible
+        if self.spec_view == 'spec':
+            self._show_spectrogram( self.ui.combo_spectrogram.currentText() )
+        elif self.spec_view == 'hjorth':
+            self._show_hjorth( self.ui.combo_spectrogram.currentText() )
 
 
     def _complete_spectrogram(self,xi,yi,zi):
@@ -215,9 +474,26 @@ class SpecMixin:
         minf = self.ui.spin_lwrfrq.value() 
         maxf = self.ui.spin_uprfrq.value()
                 
-        plot_spec( xi,yi,zi, ch, minf, maxf, ax=self.spectrogramcanvas.ax , gui = self.ui )
-
-        self.spectrogramcanvas.draw_idle()
+        pi = self.specplot.getPlotItem()
+        pi.setTitle( ch )
+        pi.setLabel( 'bottom' , 'Epoch' )
+        pi.setLabel( 'left' , 'Frequency (Hz)' )
+        pi.showAxis( 'left' , True )
+
+        if zi.size == 0:
+            self.spec_img.clear()
+        else:
+            # rows are frequency bins, columns epochs (NaN = transparent)
+            dy = ( yi[-1] - yi[0] ) / ( len(yi) - 1 ) if len(yi) > 1 else 1.0
+            m = np.isfinite( zi )
+            levels = ( np.min( zi[m] ) , np.max( zi[m] ) ) if m.any() else ( 0 , 1 )
+            self.spec_img.setImage( zi.T , lut = self.spec_lut , levels = levels , autoLevels = False )
+            self.spec_img.setRect( QtCore.QRectF( xi[0] - 0.5 , yi[0] - dy / 2 ,
+                                                  len(xi) , len(yi) * dy ) )
+            pi.setXRange( xi[0] - 0.5 , xi[-1] + 0.5 , padding = 0 )
+            pi.setYRange( minf , maxf , padding = 0 )
+        self.spec_view = 'spec'
+        self._spec_follow( self.last_x1 , self.last_x2 )
 
         
         
@@ -241,10 +517,82 @@ class SpecMixin:
         ch = self.ui.combo_spectrogram.currentText()
 
         # check it still exists in the in-memory EDF                                          
-        if ch not in self.p.edf.channels():
+        with self._luna_lock:
+            edf_chs = self.p.edf.channels()
+        if ch not in edf_chs:
             return
 
-        # do plot
-        plot_hjorth( ch , ax=self.spectrogramcanvas.ax , p = self.p , gui = self.ui )
+        # cached for this record state?
+        if self._show_hjorth( ch ):
+            return
+        key = ( self.inst_state , ch )
+
+        # otherwise, SIGSTATS on the Luna worker
+        self._busy = True
+        self._buttons(False)
+        self.sb_progress.setVisible(True)
+        self.sb_progress.setRange(0, 0)
+        self.sb_progress.setFormat("Running…")
+        self.lock_ui()
+        tok = self._start_job()
+        self.jobs.submit( self._derive_hjorth , self.p , ch ,
+                          prio = ANALYSIS , pool = 'luna' , tok = tok ,
+                          done = lambda job : self._hjorth_done( job , key ) )
+
+    def _derive_hjorth(self, p, ch):
+        # worker thread: do not touch GUI
+        with self._luna_lock:
+            return hjorth_stats( p , ch )
 
-        self.spectrogramcanvas.draw_idle()
+    def _hjorth_done(self, job, key):
+        try:
+            if job.cancelled:
+                return
+            if job.error is not None:
+                QMessageBox.critical(self.ui, "Error deriving Hjorth plot", job.tb)
+                return
+            self.hjorth_cache[ key ] = job.result
+            while len( self.hjorth_cache ) > self.hjorth_cache_max:
+                self.hjorth_cache.popitem( last = False )
+            self._complete_hjorth( job.result )
+        finally:
+            self._spectrogram_finish()
+
+    def _show_hjorth(self, ch):
+        # draw cached Hjorth stats for this record state, if any
+        key = ( self.inst_state , ch )
+        stats = self.hjorth_cache.get( key )
+        if stats is None:
+            return False
+        self.hjorth_cache.move_to_end( key )
+        self._complete_hjorth( stats )
+        return True
+
+    def _complete_hjorth(self, stats):
+        # we can now touch the GUI
+        img = hjorth_image( stats , self.ui.spin_win.value() )
+        pi = self.specplot.getPlotItem()
+        pi.setTitle( self.ui.combo_spectrogram.currentText() )
+        pi.setLabel( 'bottom' , 'Epoch' )
+        pi.showAxis( 'left' , False )
+        if len( img ) == 0:
+            self.spec_img.clear()
+        else:
+            # column k is epoch k+1; bars up/down from the midline
+            self.spec_img.setImage( img , lut = None , autoLevels = False , levels = ( 0 , 255 ) )
+            self.spec_img.setRect( QtCore.QRectF( 0.5 , -1 , len( img ) , 2 ) )
+            pi.setXRange( 0.5 , len( img ) + 0.5 , padding = 0 )
+            pi.setYRange( -1 , 1 , padding = 0 )
+        self.spec_view = 'hjorth'
+        self._spec_follow( self.last_x1 , self.last_x2 )
+
+
+    def _spec_channel_changed(self, ch):
+        # follow the channel combo w/ the plot already shown
+        if not ch or self._busy:
+            return
+        if self.spec_view == 'hjorth':
+            # cached only: otherwise left as is until the button is pressed
+            self._show_hjorth( ch )
+        elif self.spec_view == 'spec':
+            self._show_spectrogram( ch )
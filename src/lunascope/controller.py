@@ -25,15 +25,14 @@ from . import __version__
 import lunapi as lp
 import pandas as pd
 
-import os, sys, threading
-from concurrent.futures import ThreadPoolExecutor
+import os, sys, threading, itertools
 
 from PySide6.QtCore import QModelIndex, QObject, Signal, Qt, QSortFilterProxyModel
 from PySide6.QtGui import QAction, QStandardItemModel
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QDockWidget, QLabel, QFrame, QSizePolicy, QMessageBox, QLayout
 from PySide6.QtWidgets import QMainWindow, QProgressBar, QTableView, QAbstractItemView
-from PySide6.QtWidgets import QFileDialog
+from PySide6.QtWidgets import QFileDialog, QPushButton, QApplication
 from PySide6.QtWidgets import QSplitter, QVBoxLayout, QWidget
 
 import pyqtgraph as pg
@@ -51,6 +50,7 @@ from .components.masks import MasksMixin
 from .components.ctree import CTreeMixin
 from .components.spectrogram import SpecMixin
 from .components.soappops import SoapPopsMixin
+from .components.jobs import CancelToken, JobScheduler
 
 
 
@@ -82,9 +82,26 @@ class Controller( QObject,
         # Luna
         self.proj = proj
         
-        # send compute to a different thread
-        self._exec = ThreadPoolExecutor(max_workers=1)
+        # send compute to worker threads: Luna calls (serialized, see
+        # below) and NumPy work have their own pools; a finished job
+        # comes back via its done() on the GUI thread
+        self.jobs = JobScheduler( { 'luna' : 1 ,
+                                    'numpy' : max( 2 , min( 4 , ( os.cpu_count() or 2 ) - 1 ) ) } , self )
+        self.jobs.finished.connect( self._job_finished )
+        QApplication.instance().aboutToQuit.connect( self._shutdown_jobs )
         self._busy = False
+
+        # cancellation token of the current foreground job
+        self._job_tok = CancelToken()
+
+        # ( ID , version ) of the attached record, keys per-record caches
+        self.inst_state = None
+        self.inst_masks = None
+        self._inst_edits = itertools.count( 1 )
+
+        # serializes Luna calls made off the GUI thread with those made
+        # on it while background work may be running
+        self._luna_lock = threading.RLock()
         self.blocker = Blocker(self.ui, "...Processing...\n...please wait...", alpha=120)
                 
         # setups
@@ -144,6 +161,18 @@ class Controller( QObject,
         self.ui.menuView.addAction(self.ui.dock_outputs.toggleViewAction())
         self.ui.menuView.addSeparator()
         self.ui.menuView.addAction(self.ui.dock_help.toggleViewAction())
+        self.ui.menuView.addSeparator()
+        act_nav_density = QAction("Navigator Event Density", self)
+        act_nav_density.setCheckable(True)
+        act_nav_density.toggled.connect(self._toggle_nav_density)
+        self.ui.menuView.addAction(act_nav_density)
+        act_perf = QAction("Performance HUD", self)
+        act_perf.setCheckable(True)
+        act_perf.toggled.connect(self._toggle_perf)
+        act_perf_csv = QAction("Export Timings (CSV)", self)
+        act_perf_csv.triggered.connect(self._export_perf)
+        self.ui.menuView.addAction(act_perf)
+        self.ui.menuView.addAction(act_perf_csv)
 
         # set up menu: about
         act_about = QAction("Help", self)
@@ -289,6 +318,10 @@ class Controller( QObject,
         self.sb_progress = QProgressBar()
         self.sb_progress.setRange(0, 100)
         self.sb_progress.setValue(0)
+        self.sb_cancel = QPushButton("Cancel")
+        self.sb_cancel.setToolTip("Stop the running job at its next step")
+        self.sb_cancel.setVisible(False)
+        self.sb_cancel.clicked.connect( self._cancel_job )
 
         sb.addPermanentWidget(self.sb_id ,1)
         sb.addPermanentWidget(vsep(),0)
@@ -299,6 +332,7 @@ class Controller( QObject,
         sb.addPermanentWidget(self.sb_ns,1)
         sb.addPermanentWidget(vsep(),0)
         sb.addPermanentWidget(self.sb_progress,1)
+        sb.addPermanentWidget(self.sb_cancel,0)
         sb.addPermanentWidget(vsep(),0)
 
 
@@ -318,6 +352,38 @@ class Controller( QObject,
     def unlock_ui(self):
         self.blocker.hide_block()
 
+
+    # ------------------------------------------------------------
+    # cancellable foreground jobs
+    # ------------------------------------------------------------
+
+    def _job_finished(self, job):
+        if job.done is not None:
+            job.done( job )
+
+    def _shutdown_jobs(self):
+        # on quit: stop background and foreground work, then the workers
+        self._cancel_background()
+        self._job_tok.cancel()
+        self.jobs.shutdown()
+
+    def _start_job(self):
+        # fresh token for the job about to be submitted; shows Cancel
+        self._job_tok = CancelToken()
+        self.sb_cancel.setEnabled(True)
+        self.sb_cancel.setVisible(True)
+        return self._job_tok
+
+    def _end_job(self):
+        self.sb_cancel.setVisible(False)
+        self.sb_progress.setFormat("%p%")
+
+    def _cancel_job(self):
+        # the worker stops at its next check; its done-callback cleans up
+        self._job_tok.cancel()
+        self.sb_cancel.setEnabled(False)
+        self.sb_progress.setFormat("Cancelling…")
+
             
     # ------------------------------------------------------------
     # attach a new record
@@ -343,8 +409,11 @@ class Controller( QObject,
         id_str = current.siblingAtColumn(0).data(Qt.DisplayRole)
         
         # attach EDF
+        # nothing may slice the previous instance while it is replaced
+        self._cancel_background()
         try:
-            self.p = self.proj.inst( id_str )
+            with self._luna_lock:
+                self.p = self.proj.inst( id_str )
         except Exception as e:
             QMessageBox.critical(
                 self.ui,
@@ -354,10 +423,12 @@ class Controller( QObject,
             return
 
         # check for weird EDF record sizes
-        rec_size = self.p.edf.stat()['rs']
+        with self._luna_lock:
+            stat = self.p.edf.stat()
+        rec_size = stat['rs']
         if not rec_size.is_integer():
 
-            edf_file = self.p.edf.stat()['edf_file']
+            edf_file = stat['edf_file']
             base, ext = os.path.splitext(edf_file)
             if ext.lower() == ".edf":
                 edf_file = f"{base}-edit.edf"
@@ -373,7 +444,8 @@ class Controller( QObject,
 
             if reply == QMessageBox.Yes:
                 try:
-                    self.p.eval( 'RECORD-SIZE dur=1 no-problem edf=' + edf_file[:-4] )
+                    with self._luna_lock:
+                        self.p.eval( 'RECORD-SIZE dur=1 no-problem edf=' + edf_file[:-4] )
                 except Exception as e:
                     QMessageBox.critical(
                         self.ui,
@@ -388,12 +460,17 @@ class Controller( QObject,
                         "Done - now reload the new EDF (or make a new sample list)" )
                     return
         
+        # record as loaded from disk: state 0 (see _instance_edited)
+        self.inst_state = ( id_str , 0 )
+        self.inst_masks = [ ]
+
         # initiate graphs
         self.curves = [ ]
         self.annot_curves = [ ] 
 
         # and update things that need updating
         self._update_metrics()
+        self._invalidate_hypno()
         self._render_hypnogram()
         self._update_spectrogram_list()
         self._update_mask_list()
@@ -409,6 +486,20 @@ class Controller( QObject,
         # hypnogram + stats if available
         self._calc_hypnostats()
 
+        # new record: drop cached windows, build min/max pyramids
+        self._signals_changed()
+
+
+    def _instance_edited(self, mask = None):
+        # the attached record was changed in memory (Luna command, masks):
+        # a new state, never equal to an earlier one; inst_masks lists the
+        # masks applied since loading, or is None after any other change
+        self.inst_state = ( self.inst_state[0] , next( self._inst_edits ) )
+        if mask is not None and self.inst_masks is not None:
+            self.inst_masks.append( mask )
+        else:
+            self.inst_masks = None
+
         
     # ------------------------------------------------------------
     #
@@ -440,6 +531,10 @@ class Controller( QObject,
 #        clear_rows( self.ui.tbl_hypno2 )
 #        clear_rows( self.ui.tbl_hypno3 )
 
+        self.spec_cache = { }
+        self._spec_edf_id = None
+        # (a reused POPS run does not re-add its annotations: never across attaches)
+        self.sp_cache.clear()
         self.ui.combo_spectrogram.clear()
         self.ui.combo_pops.clear()
         self.ui.combo_soap.clear()
@@ -447,8 +542,7 @@ class Controller( QObject,
         self.ui.txt_out.clear()
         # self.ui.txt_inp.clear() 
         
-        self.spectrogramcanvas.ax.cla()
-        self.spectrogramcanvas.figure.canvas.draw_idle()
+        self._clear_spec()
 
         self.hypnocanvas.ax.cla()
         self.hypnocanvas.figure.canvas.draw_idle()
@@ -325,7 +325,7 @@ def random_darkbg_colors(n, seed=None):
 # ------------------------------------------------------------
 
 import weakref
-from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout
+from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QStatusBar
 from PySide6.QtCore import Qt, QEvent
 from PySide6.QtGui import QPainter, QColor
 
@@ -334,6 +334,7 @@ class Blocker(QWidget):
     """
     Child overlay that blocks input and shows a centered message.
     Safe on shutdown (no 'C++ object already deleted' errors).
+    Leaves a main window's status bar uncovered (progress, Cancel).
     """
 
     def __init__(self, parent, message="Working…", alpha=180):
@@ -380,7 +381,7 @@ class Blocker(QWidget):
         if obj is parent and ev.type() in (
             QEvent.Resize, QEvent.Move, QEvent.Show, QEvent.WindowStateChange
         ):
-            self.setGeometry(parent.rect())
+            self.setGeometry(self._block_rect(parent))
         return False
 
     def show_block(self, msg=None, alpha=None):
@@ -390,13 +391,20 @@ class Blocker(QWidget):
             self._alpha = int(alpha)
         parent = self._parent_ref()
         if parent:
-            self.setGeometry(parent.rect())
+            self.setGeometry(self._block_rect(parent))
         self.show()
         self.raise_()
 
     def hide_block(self):
         self.hide()
 
+    def _block_rect(self, parent):
+        r = parent.rect()
+        sb = parent.findChild(QStatusBar)
+        if sb is not None and sb.isVisible():
+            r.setBottom(sb.geometry().top() - 1)
+        return r
+
     def _on_parent_destroyed(self):
         self._dead = True
         self.hide()
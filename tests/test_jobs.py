@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from lunascope.components.jobs import CancelToken, JobScheduler, IDLE
+
+
+def test_resubmit_after_cancel_runs_with_live_token():
+    jobs = JobScheduler({"luna": 1})
+    try:
+        # hold the only worker, so the keyed job stays queued
+        gate = threading.Event()
+        jobs.submit(gate.wait, 5, pool="luna")
+
+        seen = { }
+        ran = threading.Event()
+
+        def work(tok):
+            seen["cancelled"] = tok.cancelled
+            ran.set()
+
+        tok1 = CancelToken()
+        job1 = jobs.submit(work, tok1, prio=IDLE, pool="luna", key=("k",), tok=tok1)
+        tok1.cancel()
+        tok2 = CancelToken()
+        job2 = jobs.submit(work, tok2, prio=IDLE, pool="luna", key=("k",), tok=tok2)
+        assert job2 is job1
+
+        gate.set()
+        assert ran.wait(5)
+        assert seen["cancelled"] is False
+        assert not job2.cancelled
+    finally:
+        jobs.shutdown()